@@ -0,0 +1,117 @@
+'''
+    analytics.py
+
+    Heatmap - where the players go, and where games are won, over many games.
+
+    A Heatmap is a Game.play() hook. Each round it only appends the players' cell indices to an array; the counting is
+    done in bulk with numpy.bincount when the array fills up (or the counts are read), rather than updating a count per
+    player per round in Python. So it can be left running over large batches of games.
+
+        heatmap = Heatmap(maze.width, maze.height)
+        for game in game_repeater(maze, RandomGoody, RandomGoody, RandomBaddy, seeds=range(100000), recycle=True):
+            game.play(hook=heatmap)
+        heatmap.counts("baddy")  # An array of visits, indexed [y][x]
+
+    The counts are kept for the whole maze, so this is only practical for mazes of moderate size.
+'''
+
+from array import array
+
+import numpy as np
+
+from maze import Game
+
+ROLES = ("goody0", "goody1", "baddy")
+EVENTS = ("catch", "meet")  # Where the baddy caught a goody, and where the goodies met
+LAYERS = ROLES + EVENTS
+
+
+class Heatmap(object):
+    ''' Per-cell counts of the rounds each player spent in each cell, and of where games ended.
+
+        Call it with a Game after each round (i.e. pass it as the 'hook' to Game.play) to record that round. The game's
+        result is recorded when it sees the game has finished. Positions are buffered until 'buffer_size' have been
+        recorded, then added to the counts.
+    '''
+
+    def __init__(self, width, height, buffer_size=1 << 20):
+        if buffer_size < 1:
+            raise ValueError("'buffer_size' must be positive, got: {}".format(buffer_size))
+        self.width = width
+        self.height = height
+        self.buffer_size = buffer_size
+        self.games = 0
+        self._cells = width * height
+        self._counts = np.zeros(len(LAYERS) * self._cells, dtype=np.int64)
+        self._buffer = array("q")  # Indices into _counts: layer * cells + y * width + x
+
+    def __call__(self, game):
+        ''' Record the players' positions after a round of 'game'. Raises ValueError, at the first round, if the game's
+            maze isn't the heatmap's size.
+        '''
+        if game.round == 1 and (game.maze.width, game.maze.height) != (self.width, self.height):
+            raise ValueError("Can't record a game in a {}x{} maze in a {}x{} heatmap".format(
+                             game.maze.width, game.maze.height, self.width, self.height))
+        width = self.width
+        position = game.position
+        goody0, goody1, baddy = position[game.goody0], position[game.goody1], position[game.baddy]
+        buffer = self._buffer
+        buffer.extend((goody0.y * width + goody0.x,
+                       self._cells + goody1.y * width + goody1.x,
+                       2 * self._cells + baddy.y * width + baddy.x))
+        if game.status != Game.in_play:
+            self.games += 1
+            if game.status == Game.baddy_wins:
+                buffer.append(3 * self._cells + baddy.y * width + baddy.x)
+            elif game.status == Game.goodies_win:
+                buffer.append(4 * self._cells + goody0.y * width + goody0.x)
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        ''' Add the buffered positions to the counts '''
+        if self._buffer:
+            self._counts += np.bincount(np.frombuffer(self._buffer, dtype=np.int64), minlength=len(self._counts))
+            del self._buffer[:]
+
+    def counts(self, layer):
+        ''' Return a copy of the counts for one of LAYERS, as an array indexed [y][x] '''
+        if layer not in LAYERS:
+            raise ValueError("Unknown layer {!r} - expected one of {}".format(layer, LAYERS))
+        self.flush()
+        index = LAYERS.index(layer)
+        return self._counts[index * self._cells:(index + 1) * self._cells].reshape(self.height, self.width).copy()
+
+    def normalised(self, layer):
+        ''' Return the counts for a layer (or the sum of several), scaled logarithmically to between 0 and 1 - so
+            that rarely visited cells still show up next to the busiest ones
+        '''
+        layers = (layer,) if isinstance(layer, str) else layer
+        counts = np.log1p(sum(self.counts(name) for name in layers).astype(np.float64))
+        peak = counts.max()
+        return counts / peak if peak else counts
+
+    def merge(self, other):
+        ''' Add the counts of another Heatmap of the same size to this one '''
+        if (other.width, other.height) != (self.width, self.height):
+            raise ValueError("Can't merge a {}x{} heatmap into a {}x{} one".format(other.width, other.height,
+                                                                                 self.width, self.height))
+        self.flush()
+        other.flush()
+        self._counts += other._counts
+        self.games += other.games
+
+    def save(self, path):
+        ''' Save the counts to a NumPy .npz file '''
+        self.flush()
+        np.savez_compressed(path, games=self.games, **{layer: self.counts(layer) for layer in LAYERS})
+
+    @classmethod
+    def load(cls, path):
+        ''' Load a Heatmap saved with save() '''
+        with np.load(path) as data:
+            height, width = data[LAYERS[0]].shape
+            heatmap = cls(width, height)
+            heatmap._counts[:] = np.concatenate([data[layer].ravel() for layer in LAYERS])
+            heatmap.games = int(data["games"])
+        return heatmap
@@ -5,19 +5,153 @@
 '''
 import random
 
-from maze import Baddy, UP, DOWN, LEFT, RIGHT, STAY
+from maze import Baddy, TabularPolicy, UP, DOWN, LEFT, RIGHT, STAY, MASK_BIT, STEP
+from planner import DStarLite
 
-class StaticBaddy(Baddy):
+_DIRECTION = {(STEP[direction].x, STEP[direction].y): direction for direction in (UP, DOWN, LEFT, RIGHT)}
+
+class StaticBaddy(TabularPolicy, Baddy):
     ''' A static baddy - does not move from its initial position '''
 
-    def take_turn(self, _obstruction, _ping_response):
+    @classmethod
+    def move_distribution(cls, _mask, _pinged):
         ''' Stay where we are '''
-        return STAY
+        return {STAY: 1}
 
-class RandomBaddy(Baddy):
+class RandomBaddy(TabularPolicy, Baddy):
     ''' A random-walking baddy '''
 
-    def take_turn(self, obstruction, _ping_response):
+    @classmethod
+    def move_distribution(cls, mask, _pinged):
         ''' Ignore any ping information, just choose a random direction to walk in. We can't ping. '''
-        possibilities = [direction for direction in (UP, DOWN, LEFT, RIGHT) if not obstruction[direction]]
-        return random.choice(possibilities)
+        return {direction: 1 for direction in (UP, DOWN, LEFT, RIGHT) if not mask & MASK_BIT[direction]}
+
+
+class PursuitBaddy(Baddy):
+    ''' A baddy that chases the goodies.
+
+        It maps the maze as it goes, from the obstructions it sees, and whenever a goody pings it heads for where the
+        nearest goody was. Paths are planned with D* Lite (see planner.py), which reuses its search from turn to turn
+        as the baddy moves and discovers walls, instead of searching from scratch every turn.
+
+        Cells it hasn't seen are assumed to be open, but paths are only planned within one cell of the area it knows
+        about (the cells it has seen, and where goodies have been) - otherwise a search could spread forever around
+        the outside of the maze. At most 'max_expansions' cells are searched or updated per turn, so a turn never takes
+        long, however big the maze. Until it has somewhere to go, it wanders, preferring cells it hasn't visited.
+
+        A new search is only started when a ping shows a goody well away from the current goal.
+    '''
+
+    max_expansions = 500
+    retarget_ratio = 4  # Replan when the goody has moved more than 1/4 of the distance from us to the goal
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        ''' Forget the map and the goodies' positions '''
+        self.position = (0, 0)  # Relative to where we started
+        self.walls = set()      # Cells known to be walls, relative to where we started
+        self.visits = {}        # How many times we have been to each cell
+        self.bounds = None      # (min x, min y, max x, max y) of the cells we know about
+        self.planner = None     # The DStarLite planner towards the current target, if there is one
+        self.unblocked = []     # Cells the planner still has to be told are no longer blocked
+
+    def take_turn(self, obstruction, ping_response):
+        ''' Record the walls around us, update the target if there was a ping, and step towards it '''
+        x, y = self.position
+        self.visits[self.position] = self.visits.get(self.position, 0) + 1
+        neighbours = {direction: (x + STEP[direction].x, y + STEP[direction].y)
+                      for direction in (UP, DOWN, LEFT, RIGHT)}
+        walls = [cell for direction, cell in neighbours.items() if obstruction[direction] and cell not in self.walls]
+        self.walls.update(walls)
+
+        target = None
+        if ping_response is not None:
+            targets = [(x + offset.x, y + offset.y) for offset in ping_response.values()]
+            target = min(targets, key=lambda cell: abs(cell[0] - x) + abs(cell[1] - y))
+        unblocked = self._include(list(neighbours.values()) + ([target] if target is not None else []))
+
+        if target is not None and self._should_replan(target):
+            self.planner = DStarLite(self.position, target, self._blocked)
+            walls, self.unblocked = [], []
+        elif self.planner is not None:
+            self.unblocked += self.planner.affected(unblocked)
+
+        move = None
+        if self.planner is not None:
+            if self.planner.goal == self.position:
+                self.planner = None  # We got there, but the goody had moved on
+            else:
+                # Telling the planner about a cell costs about as much as expanding one, so both come out of the
+                # same budget. Growing the known area can unblock more cells than that allows, and those can wait
+                # for later turns - until then the search just doesn't use them. New walls can't wait.
+                changed = self.planner.affected(walls)
+                budget = max(0, self.max_expansions - len(changed))
+                changed += self.unblocked[:budget]
+                del self.unblocked[:budget]
+                self.planner.move_start(self.position)
+                self.planner.blocked_changed(changed)
+                self.planner.compute(max(0, self.max_expansions - len(changed)))
+                step = self.planner.next_step()
+                if step is not None and self.planner.cost(step) < float("inf"):
+                    move = _DIRECTION[step[0] - x, step[1] - y]
+
+        if move is None:
+            move = self._wander(obstruction)
+        self.position = (x + STEP[move].x, y + STEP[move].y)
+        return move
+
+    def _should_replan(self, target):
+        ''' Whether to throw away the current search and start a new one towards 'target'.
+            Searches are kept while the goody is still near the goal, relative to how far away the goal is, as
+            starting again every time a goody pings would lose the benefit of searching incrementally.
+        '''
+        if self.planner is None:
+            return True
+        x, y = self.position
+        goal_x, goal_y = self.planner.goal
+        moved = abs(target[0] - goal_x) + abs(target[1] - goal_y)
+        return moved * self.retarget_ratio > abs(goal_x - x) + abs(goal_y - y)
+
+    def _blocked(self, cell):
+        ''' Whether the planner should treat a cell as blocked - a known wall, or too far from the known area '''
+        if cell in self.walls:
+            return True
+        min_x, min_y, max_x, max_y = self.bounds
+        return not (min_x - 1 <= cell[0] <= max_x + 1 and min_y - 1 <= cell[1] <= max_y + 1)
+
+    def _include(self, cells):
+        ''' Grow the known area to include 'cells'. Returns the cells that are no longer blocked as a result. '''
+        old = self.bounds
+        min_x, min_y, max_x, max_y = old if old is not None else cells[0] * 2
+        for cell_x, cell_y in cells:
+            min_x, max_x = min(min_x, cell_x), max(max_x, cell_x)
+            min_y, max_y = min(min_y, cell_y), max(max_y, cell_y)
+        self.bounds = (min_x, min_y, max_x, max_y)
+        if old is None or self.bounds == old:
+            return []
+        # Only the ring just outside the old limits can be next to a cell the planner has reached, so that is the
+        # only place where it needs to be told about the change - and only on the sides that have moved
+        left, bottom, right, top = old[0] - 2, old[1] - 2, old[2] + 2, old[3] + 2
+        ring = []
+        if min_x < old[0]:
+            ring += [(left, ring_y) for ring_y in range(bottom, top + 1)]
+        if max_x > old[2]:
+            ring += [(right, ring_y) for ring_y in range(bottom, top + 1)]
+        if min_y < old[1]:
+            ring += [(ring_x, bottom) for ring_x in range(left + 1, right)]
+        if max_y > old[3]:
+            ring += [(ring_x, top) for ring_x in range(left + 1, right)]
+        return [cell for cell in ring if not self._blocked(cell)]
+
+    def _wander(self, obstruction):
+        ''' Choose a random open direction, preferring the cells we have visited least '''
+        x, y = self.position
+        options = [direction for direction in (UP, DOWN, LEFT, RIGHT) if not obstruction[direction]]
+        if not options:
+            return STAY
+        visits = {direction: self.visits.get((x + STEP[direction].x, y + STEP[direction].y), 0)
+                  for direction in options}
+        fewest = min(visits.values())
+        return random.choice([direction for direction in options if visits[direction] == fewest])
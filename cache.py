@@ -0,0 +1,290 @@
+'''
+    cache.py
+
+    A cache of data derived from a maze's layout, shared by every Game played on a maze with the same contents.
+
+    Mazes are identified by a content hash of their cells (see Maze.content_hash), so equal mazes built separately
+    (e.g. by game_generator, or in different processes) share one entry.
+
+        MazeData - the derived data for one maze layout: obstruction masks, empty cells, connected components and
+                   distance fields (the last two are computed on first use)
+
+        DerivedDataCache - a least-recently-used cache of MazeData, bounded by (approximate) memory use, optionally
+                           backed by a directory of pickle files so that it can be shared across processes
+
+        default_cache / set_default_cache - the cache used by Maze.derived()
+'''
+
+import itertools
+import os
+import pickle
+import tempfile
+
+from array import array
+from collections import OrderedDict, deque
+
+from maze import Maze, Position, MASK_BIT, UP, LEFT, DOWN, RIGHT
+
+
+_IS_SPACE = bytes([1, 0]) + bytes(254)  # bytes.translate table: Maze.space -> 1, Maze.wall -> 0
+
+
+class MazeData(object):
+    ''' Data derived from the layout of a maze. Treat everything here as read-only.
+
+        'cells' is a bytes object holding every cell (Maze.space or Maze.wall), indexed by y * width + x
+        'masks' is a bytes object holding the obstruction mask of every cell, indexed like 'cells'
+        'empty_count' is the number of empty cells
+        'empty_cells' is an array of the indices of the empty cells (computed on first use)
+    '''
+
+    def __init__(self, maze):
+        self.width = maze.width
+        self.height = maze.height
+        self.content_hash = maze.content_hash()
+        self.cells = maze.cell_bytes()
+        self.masks = self._masks()
+        self.empty_count = self.cells.count(Maze.space)
+
+        self._empty_cells = None
+        self._components = None
+        self._distances = {}  # Maps a source cell index to its distance field
+        self.on_grow = None   # Called with the number of extra bytes whenever a lazily computed field is added
+
+    def _masks(self):
+        ''' Compute the obstruction masks of all the cells at once.
+            The cells are surrounded with a border of walls, and the grid shifted by a row or a column to line each
+            cell up with its neighbours. Treating the byte strings as (little-endian) integers, shifting every
+            byte's 0 or 1 to its mask bit, and or-ing them together, combines whole grids in a handful of operations.
+        '''
+        width, height, cells = self.width, self.height, self.cells
+        stride = width + 2
+        border = bytes([Maze.wall]) * stride
+        padded = border + b"".join(bytes([Maze.wall]) + cells[y * width:(y + 1) * width] + bytes([Maze.wall])
+                                   for y in range(height)) + border
+        neighbours = {UP: padded[stride:] + bytes(stride),   # Byte i of each is the cell beside padded cell i
+                      LEFT: bytes(1) + padded[:-1],
+                      DOWN: bytes(stride) + padded[:-stride],
+                      RIGHT: padded[1:] + bytes(1)}
+        combined = 0
+        for direction, shifted in neighbours.items():
+            combined |= int.from_bytes(shifted, "little") * MASK_BIT[direction]
+        masks = combined.to_bytes(len(padded), "little")
+        return b"".join(masks[(y + 1) * stride + 1:(y + 1) * stride + 1 + width] for y in range(height))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["on_grow"] = None
+        return state
+
+    @property
+    def empty_cells(self):
+        ''' An array of the indices (y * width + x) of the empty cells, in order '''
+        if self._empty_cells is None:
+            self._empty_cells = array("i", itertools.compress(range(len(self.cells)),
+                                                              self.cells.translate(_IS_SPACE)))
+            self._grew(self._empty_cells)
+        return self._empty_cells
+
+    def position(self, index):
+        ''' Return the Position of the cell at 'index' '''
+        return Position(index % self.width, index // self.width)
+
+    def nbytes(self):
+        ''' Return an estimate of the memory held by this object '''
+        total = len(self.cells) + len(self.masks)
+        for field in [self._empty_cells, self._components] + list(self._distances.values()):
+            if field is not None:
+                total += field.itemsize * len(field)
+        return total
+
+    def _grew(self, field):
+        if self.on_grow is not None:
+            self.on_grow(self, field.itemsize * len(field))
+
+    def _neighbours(self, index):
+        ''' Yield the indices of the empty cells adjacent to the cell at 'index' '''
+        mask = self.masks[index]
+        if not mask & MASK_BIT[UP]:
+            yield index + self.width
+        if not mask & MASK_BIT[LEFT]:
+            yield index - 1
+        if not mask & MASK_BIT[DOWN]:
+            yield index - self.width
+        if not mask & MASK_BIT[RIGHT]:
+            yield index + 1
+
+    def _index(self, position):
+        position = Position._convert(position)
+        if not (0 <= position.x < self.width and 0 <= position.y < self.height):
+            raise IndexError("{} is out of bounds (0-{}, 0-{})".format(position, self.width - 1, self.height - 1))
+        return position.y * self.width + position.x
+
+    @property
+    def components(self):
+        ''' An array, indexed like 'cells', of connected component labels (0, 1, ...) - or -1 for walls '''
+        if self._components is None:
+            labels = array("i", [-1]) * (self.width * self.height)
+            label = 0
+            for start in self.empty_cells:
+                if labels[start] != -1:
+                    continue
+                labels[start] = label
+                queue = deque([start])
+                while queue:
+                    for neighbour in self._neighbours(queue.popleft()):
+                        if labels[neighbour] == -1:
+                            labels[neighbour] = label
+                            queue.append(neighbour)
+                label += 1
+            self._components = labels
+            self._grew(labels)
+        return self._components
+
+    def connected(self, a, b):
+        ''' Return True if there is a path between the empty cells at positions 'a' and 'b' '''
+        label = self.components[self._index(a)]
+        return label != -1 and label == self.components[self._index(b)]
+
+    def distance_field(self, source):
+        ''' Return an array, indexed like 'cells', of the shortest path length from 'source' to each cell.
+            Walls and unreachable cells have distance -1.
+        '''
+        start = self._index(source)
+        field = self._distances.get(start)
+        if field is None:
+            if self.cells[start] == Maze.wall:
+                raise ValueError("{} is not an empty cell".format(source))
+            field = array("i", [-1]) * (self.width * self.height)
+            field[start] = 0
+            queue = deque([start])
+            while queue:
+                index = queue.popleft()
+                distance = field[index] + 1
+                for neighbour in self._neighbours(index):
+                    if field[neighbour] == -1:
+                        field[neighbour] = distance
+                        queue.append(neighbour)
+            self._distances[start] = field
+            self._grew(field)
+        return field
+
+    def distance(self, a, b):
+        ''' Return the shortest path length between the empty cells at positions 'a' and 'b', or -1 if none '''
+        return self.distance_field(a)[self._index(b)]
+
+
+class DerivedDataCache(object):
+    ''' A least-recently-used cache of MazeData, keyed by maze content hash.
+
+        'max_bytes' bounds the (estimated) memory held. The most recently used entry is never evicted, even if it
+        is larger than this on its own.
+
+        If 'directory' is given, entries are also written there as pickle files, and looked up there before being
+        computed - so several processes can share the work.
+    '''
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()  # content hash -> MazeData, least recently used first
+        self._sizes = {}  # content hash -> bytes counted for that entry
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, content_hash):
+        return content_hash in self._entries
+
+    def get(self, maze):
+        ''' Return the MazeData for 'maze', computing (or loading) it if needed '''
+        key = maze.content_hash()
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        data = self._load(key)
+        if data is None:
+            data = MazeData(maze)
+            self._store(data)
+        self._add(data)
+        return data
+
+    def clear(self):
+        ''' Forget all in-memory entries (files in 'directory' are kept) '''
+        for data in self._entries.values():
+            data.on_grow = None
+        self._entries.clear()
+        self._sizes.clear()
+        self.total_bytes = 0
+
+    def flush(self):
+        ''' Rewrite the files for all in-memory entries, including any lazily computed fields they now hold '''
+        for data in self._entries.values():
+            self._store(data)
+
+    def _add(self, data):
+        self._entries[data.content_hash] = data
+        self._sizes[data.content_hash] = data.nbytes()
+        self.total_bytes += self._sizes[data.content_hash]
+        data.on_grow = self._grew
+        self._evict()
+
+    def _grew(self, data, extra_bytes):
+        if self._entries.get(data.content_hash) is data:
+            self._sizes[data.content_hash] += extra_bytes
+            self.total_bytes += extra_bytes
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, data = self._entries.popitem(last=False)
+            data.on_grow = None
+            self.total_bytes -= self._sizes.pop(key)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as stream:
+                return pickle.load(stream)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _store(self, data):
+        if self.directory is None:
+            return
+        # Write to a temporary file and rename it, so that other processes never see a partial file
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as stream:
+                pickle.dump(data, stream, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(data.content_hash))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+_default_cache = DerivedDataCache()
+
+def default_cache():
+    ''' Return the cache used by Maze.derived() '''
+    return _default_cache
+
+def set_default_cache(cache):
+    ''' Replace the cache used by Maze.derived(), e.g. with one backed by a directory '''
+    global _default_cache
+    if not isinstance(cache, DerivedDataCache):
+        raise TypeError("'cache' must be a DerivedDataCache, got: {}".format(cache))
+    _default_cache = cache
@@ -0,0 +1,469 @@
+'''
+    cli.py
+
+    The command line, run as "python -m maze <command> ...". Commands:
+        play - play a single game, optionally printing each round, in the GUI, or exporting it as images
+        stats - play many seeded games and count the results
+        bench - time many seeded games, and report games and rounds per second
+        tournament - play every Goody against every Baddy (see tournament.py)
+        coordinate - like stats, but hand the games out to local and remote workers (see distributed.py)
+        work - play games for a coordinator on another machine. Both need the same MAZE_AUTHKEY environment variable.
+
+    Mazes are given with --maze, as one of:
+        a file of mazes (see Maze.from_text), separated by blank lines
+        a dotted path to a Maze, a list of mazes, or a function returning either, e.g. example.EXAMPLE_MAZE
+        a call of such a function with literal arguments, e.g. "generators.perfect_maze(41, 41, seed=3)"
+    Players are given by the dotted paths of their classes, e.g. --baddy baddies.RandomBaddy
+
+    Games are seeded, so results are reproducible and don't depend on the number of --workers.
+'''
+
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from maze import Maze, Goody, Baddy, TabularPolicy, game_repeater
+from sparse import SparseMaze
+from tournament import RESULTS, ResultStore, class_path, discover_players, format_matrix, matchup_matrix, resolve
+from tournament import run_games
+
+
+DEFAULT_MAZE = "example.EXAMPLE_MAZE"
+DEFAULT_GOODY = "goodies.RandomGoody"
+DEFAULT_BADDY = "baddies.RandomBaddy"
+
+
+def load_mazes(spec):
+    ''' Return a list of the mazes described by 'spec' - see the module docstring '''
+    if os.path.exists(spec):
+        with open(spec) as stream:
+            text = stream.read()
+        return [Maze.from_text(part) for part in text.replace("\r\n", "\n").split("\n\n") if part.strip()]
+
+    if spec.endswith(")") and "(" in spec:
+        path, _, arguments = spec[:-1].partition("(")
+        call = ast.parse("f({})".format(arguments), mode="eval").body
+        args = [ast.literal_eval(arg) for arg in call.args]
+        kwargs = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords}
+        value = resolve(path.strip())(*args, **kwargs)
+    else:
+        value = resolve(spec)
+        if callable(value) and not isinstance(value, Maze):
+            value = value()
+
+    mazes = [value] if isinstance(value, Maze) else list(value)
+    for maze in mazes:
+        if not isinstance(maze, Maze):
+            raise TypeError("{} must give a Maze or a list of mazes, got: {}".format(spec, maze))
+    return mazes
+
+
+def load_player(path, base):
+    ''' Return the player class at a dotted path, checking that it derives from 'base' (Goody or Baddy) '''
+    cls = resolve(path)
+    if not isinstance(cls, type) or not issubclass(cls, base):
+        raise TypeError("{} is not a {} class".format(path, base.__name__))
+    return cls
+
+
+class UsageError(Exception):
+    ''' A problem with the command line's arguments - reported with the usage message, rather than a traceback '''
+
+
+_ARGUMENT_ERRORS = (ValueError, TypeError, ImportError, SyntaxError)  # What loading a bad maze or player raises
+
+
+def _mazes(specs):
+    ''' Load the mazes described by each of 'specs' (see load_mazes). Raises UsageError if any can't be loaded. '''
+    mazes = []
+    for spec in specs:
+        try:
+            mazes.extend(load_mazes(spec))
+        except _ARGUMENT_ERRORS as error:
+            raise UsageError("--maze {}: {}".format(spec, error)) from error
+    if not mazes:
+        raise UsageError("--maze {} gave no mazes".format(" ".join(specs)))
+    return mazes
+
+
+def _player(option, path, base):
+    ''' Load a player class (see load_player). Raises UsageError if it can't be loaded. '''
+    try:
+        return load_player(path, base)
+    except _ARGUMENT_ERRORS as error:
+        raise UsageError("{} {}: {}".format(option, path, error)) from error
+
+
+def _run_games_task(args):
+    ''' Unpack the arguments to run_games - for use with Pool.imap_unordered. The hook (the last argument) is
+        returned with the counts, so that what it recorded in the worker process gets back to the caller.
+    '''
+    return run_games(*args), args[-1]
+
+
+def play_many(mazes, goody0_cls, goody1_cls, baddy_cls, seeds, max_rounds, workers=1, log=None, heatmap=None):
+    ''' Play every seed on every maze, splitting the work between 'workers' processes.
+        Returns a dict with a count for each result, and the total number of rounds played.
+        If 'heatmap' (an analytics.Heatmap) is given, every game is recorded in it - so the mazes must all be its size.
+    '''
+    totals = dict.fromkeys(RESULTS + ("rounds",), 0)
+    if workers <= 1:
+        results = (run_games(maze, goody0_cls, goody1_cls, baddy_cls, seeds, max_rounds, log, heatmap)
+                   for maze in mazes)
+    else:
+        if log is not None:
+            raise ValueError("A results log can't be used with more than one worker")
+        # A few chunks per worker, so that they all finish at about the same time. Each records into its own
+        # (empty) copy of the heatmap, and they're merged at the end.
+        chunk_size = max(1, len(seeds) // (workers * 4))
+        empty = None if heatmap is None else type(heatmap)(heatmap.width, heatmap.height)
+        tasks = [(maze, goody0_cls, goody1_cls, baddy_cls, seeds[start:start + chunk_size], max_rounds, None, empty)
+                 for maze in mazes for start in range(0, len(seeds), chunk_size)]
+        with multiprocessing.Pool(workers) as pool:
+            results = []
+            for counts, task_heatmap in pool.imap_unordered(_run_games_task, tasks):
+                if heatmap is not None:
+                    heatmap.merge(task_heatmap)
+                results.append(counts)
+    for counts in results:
+        for name in totals:
+            totals[name] += counts[name]
+    return totals
+
+
+def _open_log(path):
+    if path is None:
+        return None
+    from resultlog import ResultLog  # Needs NumPy, so only imported when asked for
+    return ResultLog(path)
+
+
+def _players(args):
+    goody0 = _player("--goody0" if args.goody0 else "--goody", args.goody0 or args.goody, Goody)
+    goody1 = _player("--goody1" if args.goody1 else "--goody", args.goody1 or args.goody, Goody)
+    baddy = _player("--baddy", args.baddy, Baddy)
+    return goody0, goody1, baddy
+
+
+def _output(args, data, text):
+    print(json.dumps(data, indent=1) if args.json else text)
+
+
+def play_command(args):
+    goody0_cls, goody1_cls, baddy_cls = _players(args)
+    maze = _mazes(args.maze[:1])[0]
+
+    if args.gui:
+        from PyQt5.QtWidgets import QApplication  # Only needed for the GUI
+        from gui import GameViewer
+        app = QApplication.instance() or QApplication(sys.argv)
+        viewer = GameViewer()
+        if args.heatmap is not None:
+            from analytics import Heatmap
+            viewer.set_heatmap(Heatmap.load(args.heatmap))
+        viewer.show()
+        viewer.set_game_generator(game_repeater(maze, goody0_cls, goody1_cls, baddy_cls, max_rounds=args.max_rounds,
+                                                seeds=range(args.seed, sys.maxsize)))
+        return app.exec_()
+
+    game = next(game_repeater(maze, goody0_cls, goody1_cls, baddy_cls, max_rounds=args.max_rounds,
+                              seeds=[args.seed]))
+
+    if args.export is not None:
+        from export import export_game  # Needs PyQt5 (and Pillow for GIFs), so only imported when asked for
+        start = time.perf_counter()
+        result, frames = export_game(game, args.export, cell_size=args.cell_size, step=args.frame_step)
+        elapsed = time.perf_counter() - start
+        _output(args, {"seed": args.seed, "result": result, "rounds": game.round, "frames": frames,
+                       "seconds": elapsed},
+                "{} after {} rounds (seed {}): wrote {} frames to {} in {:.2f}s".format(
+                    result, game.round, args.seed, frames, args.export, elapsed))
+        return
+
+    def hook(game):
+        print(game, "\n")
+        time.sleep(args.delay)
+
+    result, rounds = game.play(hook=hook if args.show else None)
+    _output(args, {"seed": args.seed, "result": result, "rounds": rounds},
+            "{} after {} rounds (seed {})".format(result, rounds, args.seed))
+
+
+def stats_command(args):
+    goody0_cls, goody1_cls, baddy_cls = _players(args)
+    mazes = _mazes(args.maze)
+    seeds = range(args.seed, args.seed + args.games)
+    if args.log is not None and args.workers > 1:
+        raise UsageError("--log can't be used with more than one worker")
+    if args.heatmap is not None and len({(maze.width, maze.height) for maze in mazes}) != 1:
+        raise UsageError("--heatmap needs all the mazes to be the same size")
+    log = _open_log(args.log)
+    heatmap = None
+    if args.heatmap is not None:
+        from analytics import Heatmap  # Needs NumPy, so only imported when asked for
+        heatmap = Heatmap(mazes[0].width, mazes[0].height)
+    try:
+        totals = play_many(mazes, goody0_cls, goody1_cls, baddy_cls, seeds, args.max_rounds, args.workers, log,
+                           heatmap)
+    finally:
+        if log is not None:
+            log.close()
+    if heatmap is not None:
+        heatmap.save(args.heatmap)
+    _output_totals(args, (goody0_cls, goody1_cls, baddy_cls), mazes, totals)
+
+
+def _output_totals(args, players, mazes, totals):
+    games = sum(totals[result] for result in RESULTS)
+    data = {"players": [class_path(cls) for cls in players],
+            "mazes": len(mazes), "games": games, "results": {result: totals[result] for result in RESULTS},
+            "rounds": totals["rounds"]}
+    _output(args, data, "\n".join(["{} games".format(games)] +
+                                  ["  {}: {} ({:.1%})".format(result, totals[result], totals[result] / games)
+                                   for result in RESULTS] +
+                                  ["  mean rounds: {:.1f}".format(totals["rounds"] / games)]))
+
+
+def _address(text):
+    ''' An argparse type for "host:port" addresses '''
+    host, _, port = text.rpartition(":")
+    if not port.isdigit():
+        raise argparse.ArgumentTypeError("expected an address like host:port, got: {}".format(text))
+    return host, int(port)
+
+
+def _authkey():
+    ''' The key that coordinators and workers share, from the MAZE_AUTHKEY environment variable.
+        Without it, only worker processes started by the coordinator itself can connect.
+    '''
+    key = os.environ.get("MAZE_AUTHKEY")
+    return None if key is None else key.encode("utf-8")
+
+
+def coordinate_command(args):
+    from distributed import Coordinator, work
+    goody0_cls, goody1_cls, baddy_cls = _players(args)
+    mazes = _mazes(args.maze)
+    seeds = range(args.seed, args.seed + args.games)
+    coordinator = Coordinator(args.listen, authkey=_authkey(), lease_seconds=args.lease_seconds)
+    print("Coordinator listening on {}:{}".format(*coordinator.address), file=sys.stderr)
+    for maze in mazes:
+        coordinator.add_games(maze, goody0_cls, goody1_cls, baddy_cls, seeds, args.max_rounds, args.chunk_size)
+    workers = [multiprocessing.Process(target=work, args=(coordinator.address, coordinator.authkey))
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        totals = coordinator.wait()
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.join()
+    _output_totals(args, (goody0_cls, goody1_cls, baddy_cls), mazes, totals)
+
+
+def work_command(args):
+    from distributed import work
+    authkey = _authkey()
+    if authkey is None:
+        raise UsageError("Set MAZE_AUTHKEY to the coordinator's key")
+    if args.workers <= 1:
+        completed = work(args.connect, authkey)
+    else:
+        with multiprocessing.Pool(args.workers) as pool:
+            completed = sum(pool.starmap(work, [(args.connect, authkey)] * args.workers))
+    _output(args, {"tasks": completed}, "Completed {} tasks".format(completed))
+
+
+def _timed(player_cls, times):
+    ''' Return a subclass of 'player_cls' that appends the time taken by each call of take_turn to 'times' '''
+    def take_turn(self, obstruction, ping_response):
+        start = time.perf_counter()
+        move = player_cls.take_turn(self, obstruction, ping_response)
+        times.append(time.perf_counter() - start)
+        return move
+    return type(player_cls.__name__, (player_cls,), {"take_turn": take_turn, "__module__": player_cls.__module__})
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def bench_command(args):
+    goody0_cls, goody1_cls, baddy_cls = _players(args)
+    mazes = _mazes(args.maze)
+    seeds = range(args.seed, args.seed + args.games)
+    turn_times = []
+    if args.turn_times:
+        if args.workers > 1:
+            raise UsageError("--turn-times can only be used with one worker")
+        if issubclass(baddy_cls, TabularPolicy):
+            raise UsageError("--turn-times needs a baddy that takes its own turns, not a TabularPolicy")
+        baddy_cls = _timed(baddy_cls, turn_times)
+    for maze in mazes:
+        if not isinstance(maze, SparseMaze):  # A SparseMaze is played without it, and may be far too large for it
+            maze.derived()  # Don't time building the cache of maze data
+    start = time.perf_counter()
+    totals = play_many(mazes, goody0_cls, goody1_cls, baddy_cls, seeds, args.max_rounds, args.workers)
+    elapsed = time.perf_counter() - start
+    games = sum(totals[result] for result in RESULTS)
+    data = {"players": [class_path(cls) for cls in (goody0_cls, goody1_cls, baddy_cls)],
+            "workers": args.workers, "games": games, "rounds": totals["rounds"], "seconds": elapsed,
+            "games_per_second": games / elapsed, "rounds_per_second": totals["rounds"] / elapsed,
+            "microseconds_per_round": elapsed / max(totals["rounds"], 1) * 1e6}
+    text = ("{games} games, {rounds} rounds in {seconds:.3f}s: {games_per_second:.1f} games/s, "
+            "{rounds_per_second:.0f} rounds/s, {microseconds_per_round:.2f}us per round".format(**data))
+    if turn_times:
+        turn_times.sort()
+        data["baddy_turn_microseconds"] = {"mean": sum(turn_times) / len(turn_times) * 1e6,
+                                           "p50": _percentile(turn_times, 0.5) * 1e6,
+                                           "p99": _percentile(turn_times, 0.99) * 1e6,
+                                           "max": turn_times[-1] * 1e6}
+        text += "\nbaddy turns: mean {mean:.1f}us, p50 {p50:.1f}us, p99 {p99:.1f}us, max {max:.1f}us".format(
+                **data["baddy_turn_microseconds"])
+    _output(args, data, text)
+
+
+def tournament_command(args):
+    mazes = _mazes(args.maze)
+    try:
+        goodies, baddies = discover_players(args.modules)
+    except ImportError as error:
+        raise UsageError("modules {}: {}".format(" ".join(args.modules), error)) from error
+    if args.log is not None and args.workers > 1:
+        raise UsageError("--log can't be used with more than one worker")
+    if not goodies or not baddies:
+        print("No {} found in: {}".format("goodies" if not goodies else "baddies", " ".join(args.modules)),
+              file=sys.stderr)
+        return 1
+    seeds = range(args.seed, args.seed + args.games)
+
+    def progress(maze, goody_cls, baddy_cls, counts, cached):
+        if not args.quiet:
+            print("{} vs {} on {}: {}{}".format(goody_cls.__name__, baddy_cls.__name__, maze.content_hash()[:8],
+                                                {result: counts[result] for result in RESULTS},
+                                                " (cached)" if cached else ""), file=sys.stderr)
+
+    log = _open_log(args.log)
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    try:
+        matrix = matchup_matrix(mazes, goodies, baddies, seeds, max_rounds=args.max_rounds,
+                                store=ResultStore(args.store), progress=progress, log=log, pool=pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if log is not None:
+            log.close()
+    data = [{"goody": class_path(goody_cls), "baddy": class_path(baddy_cls), "results": counts}
+            for (goody_cls, baddy_cls), counts in matrix.items()]
+    _output(args, data, format_matrix(matrix))
+
+
+def _positive_int(text):
+    ''' An argparse type for counts that must be at least 1 '''
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, got: {}".format(value))
+    return value
+
+
+def _non_negative_int(text):
+    ''' An argparse type for counts that may be 0 '''
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError("must not be negative, got: {}".format(value))
+    return value
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="python -m maze", description="Play, measure and compare maze players")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--maze", action="append",
+                        help="maze file, dotted path, or generator call (default: {}). May be repeated, except "
+                             "for 'play'".format(DEFAULT_MAZE))
+    common.add_argument("--seed", type=int, default=0, help="seed of the first game (default: 0)")
+    common.add_argument("--max-rounds", type=_positive_int, default=10000, help="rounds before a draw (default: 10000)")
+    common.add_argument("--json", action="store_true", help="print the results as JSON")
+
+    players = argparse.ArgumentParser(add_help=False)
+    players.add_argument("--goody", default=DEFAULT_GOODY, help="class of both goodies (default: {})"
+                                                                .format(DEFAULT_GOODY))
+    players.add_argument("--goody0", help="class of the first goody, if different")
+    players.add_argument("--goody1", help="class of the second goody, if different")
+    players.add_argument("--baddy", default=DEFAULT_BADDY, help="class of the baddy (default: {})"
+                                                                .format(DEFAULT_BADDY))
+
+    many = argparse.ArgumentParser(add_help=False)
+    many.add_argument("--games", type=_positive_int, default=1000, help="games per maze (and pairing) (default: 1000)")
+    many.add_argument("--workers", type=_positive_int, default=1, help="number of processes to play in (default: 1)")
+
+    play = commands.add_parser("play", parents=[common, players], help="play a single game")
+    play.add_argument("--show", action="store_true", help="print the game after every round")
+    play.add_argument("--delay", type=float, default=0.1, help="seconds to pause after printing each round")
+    play.add_argument("--gui", action="store_true", help="watch games in the GUI instead")
+    play.add_argument("--heatmap", help="with --gui, show a heatmap saved by 'stats --heatmap' under the maze")
+    play.add_argument("--export", metavar="PATH",
+                      help="render the game to an animated GIF (if PATH ends in .gif) or a directory of PNGs")
+    play.add_argument("--cell-size", type=_positive_int, default=8, help="with --export, pixels per cell (default: 8)")
+    play.add_argument("--frame-step", type=_positive_int, default=1,
+                      help="with --export, rounds per frame (default: 1)")
+    play.set_defaults(run=play_command)
+
+    stats = commands.add_parser("stats", parents=[common, players, many], help="count the results of many games")
+    stats.add_argument("--log", help="directory of a results log (see resultlog.py) to record each game in")
+    stats.add_argument("--heatmap", help=".npz file to save a heatmap of the players' positions to (see analytics.py)")
+    stats.set_defaults(run=stats_command)
+
+    bench = commands.add_parser("bench", parents=[common, players, many], help="time many games")
+    bench.add_argument("--turn-times", action="store_true", help="also time each of the baddy's turns")
+    bench.set_defaults(run=bench_command)
+
+    tournament = commands.add_parser("tournament", parents=[common, many],
+                                     help="play every Goody against every Baddy")
+    tournament.add_argument("modules", nargs="*", default=["goodies", "baddies"],
+                            help="modules to search for players (default: goodies baddies)")
+    tournament.add_argument("--store", help="JSON file to keep results in, so unchanged pairings aren't replayed")
+    tournament.add_argument("--log", help="directory of a results log (see resultlog.py) to record each game in")
+    tournament.add_argument("--quiet", action="store_true", help="don't report each pairing as it finishes")
+    tournament.set_defaults(run=tournament_command, games=100)
+
+    coordinate = commands.add_parser("coordinate", parents=[common, players],
+                                     help="like stats, but hand the games out to workers (see distributed.py)")
+    coordinate.add_argument("--games", type=_positive_int, default=1000,
+                            help="games per maze (default: 1000)")
+    coordinate.add_argument("--workers", type=_non_negative_int, default=1,
+                            help="number of worker processes to start on this machine (default: 1)")
+    coordinate.add_argument("--listen", type=_address, default="localhost:6000",
+                            help="host:port to listen for workers on (default: localhost:6000)")
+    coordinate.add_argument("--chunk-size", type=_positive_int, default=100, help="games per task (default: 100)")
+    coordinate.add_argument("--lease-seconds", type=float, default=300,
+                            help="seconds before an unfinished task is handed to another worker (default: 300)")
+    coordinate.set_defaults(run=coordinate_command)
+
+    work = commands.add_parser("work", help="play games handed out by a coordinator")
+    work.add_argument("--connect", type=_address, required=True, help="host:port of the coordinator")
+    work.add_argument("--workers", type=_positive_int, default=1, help="number of processes to play in (default: 1)")
+    work.add_argument("--json", action="store_true", help="print the results as JSON")
+    work.set_defaults(run=work_command, maze=[])
+
+    return parser
+
+
+def main(argv=None):
+    ''' Run the command line, with the given arguments (default: sys.argv[1:]). Returns the exit status. '''
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.maze is None:
+        args.maze = [DEFAULT_MAZE]
+    try:
+        return args.run(args) or 0
+    except UsageError as error:
+        parser.error(str(error))
@@ -0,0 +1,301 @@
+'''
+    distributed.py
+
+    Play games on several machines. A Coordinator splits runs of seeded games into tasks, hands them out to workers
+    over TCP, and totals the results.
+
+    A task is a chunk of a run - a maze, the player classes, a range of seeds and the round limit. It's sent as
+        (task id, lease, (maze hash, class paths, class code hashes, (seed start, stop, step), max rounds))
+    and the maze itself is only sent the first time a worker needs it. A task's result is sent back as its counts in
+    RESULTS order, followed by the number of rounds.
+
+    Workers lease their tasks. If a worker dies, or is too slow, its lease expires and the task is handed out again.
+    A task that fails, or whose lease expires, 'max_attempts' times fails the whole run. Each task's result is counted
+    exactly once, however many workers complete it - the games are seeded, so every completion gives the same result.
+
+    Connections use multiprocessing.connection, so both ends need the same 'authkey'. Messages are pickled, so only
+    share the key with machines you trust.
+
+        coordinator = Coordinator(("", 6000), authkey=b"secret")
+        coordinator.add_games(maze, RandomGoody, RandomGoody, RandomBaddy, range(1000000), chunk_size=1000)
+        # ...and on each worker machine: work(("coordinator-host", 6000), authkey=b"secret")
+        totals = coordinator.wait()
+        coordinator.close()
+
+    Workers must be able to import the player classes, and must have the same code for them (see tournament.code_hash).
+
+    If the coordinator can't answer a request, it replies with a RequestError, which the worker raises. A task the
+    worker can't get what it needs for fails (and is retried, as above); other requests stop the worker.
+'''
+
+import itertools
+import threading
+import time
+
+from collections import deque
+from multiprocessing import AuthenticationError, current_process
+from multiprocessing.connection import Client, Listener
+
+from tournament import RESULTS, class_path, code_hash, resolve, run_games
+
+STOP = "stop"  # The reply to a worker asking for a task once the coordinator has closed
+
+
+class RequestError(Exception):
+    ''' The coordinator couldn't answer a worker's request. Sent as the reply, and raised in the worker. '''
+
+
+class Coordinator(object):
+    ''' Hands out tasks to workers, and collects their results.
+
+        It listens on 'address' (the port may be 0, for any free port - see the 'address' attribute) in a background
+        thread. 'authkey' defaults to the current process's authkey, which worker processes it starts will share.
+    '''
+
+    def __init__(self, address=("127.0.0.1", 0), authkey=None, lease_seconds=300, max_attempts=3):
+        if lease_seconds <= 0:
+            raise ValueError("'lease_seconds' must be positive, got: {}".format(lease_seconds))
+        if max_attempts < 1:
+            raise ValueError("'max_attempts' must be at least 1, got: {}".format(max_attempts))
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.duplicates = 0  # The number of results received for tasks that were already complete
+
+        self._changed = threading.Condition()  # Guards everything below, and is notified as tasks finish
+        self._tasks = []          # Task payloads, indexed by task id
+        self._pending = deque()   # Ids of tasks waiting for a worker
+        self._leases = {}         # Task id -> (lease, expiry time) of tasks being worked on
+        self._attempts = {}       # Task id -> number of times it has been handed out
+        self._errors = {}         # Task id -> messages about its failed attempts
+        self._failed = {}         # Task id -> messages, for tasks that have run out of attempts
+        self._results = {}        # Task id -> result
+        self._mazes = {}          # Content hash -> Maze
+        self._next_lease = itertools.count(1)
+        self._handlers = {"task": self._lease_task, "complete": self._complete, "fail": self._fail,
+                          "maze": self._maze}
+        self._closed = False
+
+        self.authkey = current_process().authkey if authkey is None else authkey
+        self._listener = Listener(address, authkey=self.authkey)
+        self.address = self._listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def add_games(self, maze, goody0_cls, goody1_cls, baddy_cls, seeds, max_rounds=10000, chunk_size=100):
+        ''' Add tasks to play one game per seed in 'seeds' (a range), 'chunk_size' games per task.
+            Returns the ids of the new tasks.
+        '''
+        if not isinstance(seeds, range):
+            raise TypeError("'seeds' must be a range, got: {}".format(seeds))
+        if chunk_size < 1:
+            raise ValueError("'chunk_size' must be positive, got: {}".format(chunk_size))
+        players = (goody0_cls, goody1_cls, baddy_cls)
+        paths = tuple(class_path(cls) for cls in players)
+        hashes = tuple(code_hash(cls) for cls in players)
+        with self._changed:
+            self._mazes[maze.content_hash()] = maze
+            task_ids = []
+            for start in range(0, len(seeds), chunk_size):
+                chunk = seeds[start:start + chunk_size]
+                task_ids.append(len(self._tasks))
+                self._tasks.append((maze.content_hash(), paths, hashes, (chunk.start, chunk.stop, chunk.step),
+                                    max_rounds))
+                self._pending.append(task_ids[-1])
+            self._changed.notify_all()
+        return task_ids
+
+    def _accept(self):
+        ''' Private - the listening thread. Serves each connection in a thread of its own. '''
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed:
+                    return
+                continue  # E.g. a client that failed authentication
+            if self._closed:
+                connection.close()
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        ''' Private - answer a worker's requests, until it disconnects '''
+        with connection:
+            try:
+                while True:
+                    request = connection.recv()
+                    try:
+                        method, args = request
+                        if method not in self._handlers:
+                            raise ValueError("Unknown request: {!r}".format(method))
+                        reply = self._handlers[method](*args)
+                    except Exception as error:
+                        # Tell the worker, rather than dropping the connection - it may be holding a lease
+                        reply = RequestError("{}: {}".format(type(error).__name__, error))
+                    connection.send(reply)
+            except (EOFError, OSError):
+                pass  # The worker has gone. If it held a lease, that will expire.
+
+    def _expire(self):
+        ''' Private - requeue the tasks whose leases have expired. Must be called holding the lock. '''
+        now = time.monotonic()
+        for task_id, (_lease, expiry) in list(self._leases.items()):
+            if expiry <= now:
+                del self._leases[task_id]
+                if task_id not in self._results:
+                    self._retry(task_id, "lease expired")
+
+    def _retry(self, task_id, message):
+        ''' Private - requeue a task after a failed attempt, unless it's out of attempts, or has been completed after
+            all. Must hold the lock.
+        '''
+        if task_id in self._results:
+            return
+        self._errors.setdefault(task_id, []).append(message)
+        if self._attempts[task_id] >= self.max_attempts:
+            self._failed[task_id] = self._errors[task_id]
+        else:
+            self._pending.append(task_id)
+        self._changed.notify_all()
+
+    def _lease_task(self):
+        ''' Private - return the next task for a worker, None if there isn't one yet, or STOP if it should stop '''
+        with self._changed:
+            if self._closed:
+                return STOP
+            self._expire()
+            while self._pending:
+                task_id = self._pending.popleft()
+                if task_id in self._results:
+                    continue  # Completed by the worker whose lease expired, after all
+                lease = next(self._next_lease)
+                self._leases[task_id] = (lease, time.monotonic() + self.lease_seconds)
+                self._attempts[task_id] = self._attempts.get(task_id, 0) + 1
+                return task_id, lease, self._tasks[task_id]
+            return None
+
+    def _maze(self, maze_hash):
+        ''' Private - return the maze with the given content hash '''
+        with self._changed:
+            if maze_hash not in self._mazes:
+                raise ValueError("Unknown maze: {}".format(maze_hash))
+            return self._mazes[maze_hash]
+
+    def _complete(self, task_id, lease, result):
+        ''' Private - record a task's result, unless it was already complete. Returns True if it was recorded. '''
+        with self._changed:
+            # Whichever lease it was completed under, any other lease on it is no longer needed - left to expire,
+            # it would count as a failed attempt
+            self._leases.pop(task_id, None)
+            if task_id in self._results:
+                self.duplicates += 1
+                return False
+            self._results[task_id] = result
+            self._failed.pop(task_id, None)
+            self._changed.notify_all()
+            return True
+
+    def _fail(self, task_id, lease, message):
+        ''' Private - a worker couldn't play a task. Ignored if its lease has already expired. '''
+        with self._changed:
+            if self._leases.get(task_id, (None,))[0] != lease:
+                return False
+            del self._leases[task_id]
+            self._retry(task_id, message)
+            return True
+
+    def totals(self):
+        ''' Return a dict with a count for each result, and the total number of rounds, over the completed tasks '''
+        with self._changed:
+            totals = dict.fromkeys(RESULTS + ("rounds",), 0)
+            for result in self._results.values():
+                for name, count in zip(RESULTS + ("rounds",), result):
+                    totals[name] += count
+            return totals
+
+    def wait(self, timeout=None):
+        ''' Wait until every task is complete, and return the totals.
+            Raises RuntimeError if a task has run out of attempts, or TimeoutError after 'timeout' seconds.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                self._expire()
+                if self._failed:
+                    task_id, errors = min(self._failed.items())
+                    raise RuntimeError("Task {} failed after {} attempts: {}".format(task_id, len(errors),
+                                                                                     "; ".join(errors)))
+                if len(self._results) == len(self._tasks):
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("{} of {} tasks are still unfinished".format(
+                                       len(self._tasks) - len(self._results), len(self._tasks)))
+                # Wake up now and then to expire leases, as nothing else will notify us when a worker dies
+                interval = min(1, self.lease_seconds)
+                if deadline is not None:
+                    interval = max(0, min(interval, deadline - time.monotonic()))
+                self._changed.wait(interval)
+        return self.totals()
+
+    def close(self):
+        ''' Stop listening. Connected workers are told to stop the next time they ask for a task. '''
+        with self._changed:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            Client(self.address, authkey=self.authkey).close()  # Wake the listening thread, so it sees we're closed
+        except OSError:
+            pass
+        self._listener.close()
+
+
+def _load_player(path, expected_hash):
+    cls = resolve(path)
+    if code_hash(cls) != expected_hash:
+        raise RuntimeError("{} has different code on this worker".format(path))
+    return cls
+
+
+def work(address, authkey=None, poll_interval=0.5):
+    ''' Play tasks from the coordinator at 'address' until it closes or goes away. 'authkey' defaults to the current
+        process's authkey, like the Coordinator's. Returns the number of tasks completed.
+        Raises RequestError if the coordinator can't answer a request other than for what a task needs.
+    '''
+    completed = 0
+    mazes = {}
+
+    with Client(address, authkey=current_process().authkey if authkey is None else authkey) as connection:
+        def request(method, *args):
+            connection.send((method, args))
+            reply = connection.recv()
+            if isinstance(reply, RequestError):
+                raise reply
+            return reply
+
+        try:
+            while True:
+                task = request("task")
+                if task == STOP:
+                    return completed
+                if task is None:
+                    time.sleep(poll_interval)  # Nothing to do yet - more tasks may be added, or leases expire
+                    continue
+                task_id, lease, (maze_hash, paths, hashes, seeds, max_rounds) = task
+                try:
+                    if maze_hash not in mazes:
+                        mazes[maze_hash] = request("maze", maze_hash)
+                    players = [_load_player(path, expected) for path, expected in zip(paths, hashes)]
+                    counts = run_games(mazes[maze_hash], *players, seeds=range(*seeds), max_rounds=max_rounds)
+                except Exception as error:
+                    request("fail", task_id, lease, "{}: {}".format(type(error).__name__, error))
+                    continue
+                request("complete", task_id, lease, tuple(counts[name] for name in RESULTS) + (counts["rounds"],))
+                completed += 1
+        except (EOFError, ConnectionError):
+            return completed  # The coordinator has gone
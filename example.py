@@ -9,13 +9,10 @@ import time
 
 from collections import defaultdict
 
-from PyQt5.QtWidgets import QApplication
-
 from maze import Maze, Game, game_repeater
 from goodies import RandomGoody
 from goodies import TPWGoody
 from baddies import RandomBaddy
-from gui import GameViewer
 
 
 EXAMPLE_MAZE = Maze(10, 10, "0001010000"
@@ -48,7 +45,8 @@ def stats_example(total_games):
     ''' Plays many games, printing cumulative and final stats '''
 
     results = defaultdict(int)
-    for game_number, game in enumerate(game_repeater(EXAMPLE_MAZE, TPWGoody, TPWGoody, RandomBaddy)):
+    games = game_repeater(EXAMPLE_MAZE, TPWGoody, TPWGoody, RandomBaddy, recycle=True)
+    for game_number, game in enumerate(games):
         if game_number == total_games:
             break
         result, _rounds = game.play()
@@ -60,6 +58,10 @@ def stats_example(total_games):
 
 def gui_example():
     ''' Opens a GUI, allowing games to be stepped through or quickly played one after another '''
+    # Qt is only imported here, so the other examples (and anything importing EXAMPLE_MAZE) run without it
+    from PyQt5.QtWidgets import QApplication
+    from gui import GameViewer
+
     app = QApplication.instance() or QApplication(sys.argv)
     gv = GameViewer()
     gv.show()
@@ -0,0 +1,177 @@
+'''
+    export.py
+
+    Render games to image files without a window - as a numbered sequence of PNGs, or an animated GIF.
+
+    Frames are drawn into QImages on Qt's "offscreen" platform (unless QT_QPA_PLATFORM is already set), so no display
+    is needed and nothing waits on the GUI's round timer. The walls are drawn once, into a background image; each frame
+    is a copy of it with the players painted on top.
+
+    A trace is a list of frames, one per round plus the starting positions, each a tuple of the (x, y) positions of
+    goody0, goody1 and the baddy - see record_trace().
+
+        export_game - play a game to the end, and export it
+        export_trace - export a recorded trace
+        FrameRenderer - draws the frames
+
+    Frames are written as they are drawn, 8 bits a pixel, so long games don't need them all in memory at once. After
+    the first, each GIF frame only holds the rectangle that changed since the one before - the walls never move.
+    Writing GIFs needs Pillow.
+'''
+
+import os
+
+import numpy as np
+
+from PyQt5.QtCore import QRect, Qt
+from PyQt5.QtGui import QColor, QGuiApplication, QImage, QPainter
+
+from gui import GameViewer
+from maze import Game, Maze
+
+BACKGROUND_COLOUR = 0xFFFFFFFF
+WALL_COLOUR = GameViewer.wall_brush.color().rgb()
+PLAYER_COLOURS = (GameViewer.goody0_brush.color().rgb(), GameViewer.goody1_brush.color().rgb(),
+                  GameViewer.baddy_brush.color().rgb())
+PALETTE = (BACKGROUND_COLOUR, WALL_COLOUR) + PLAYER_COLOURS  # Every colour a frame can contain
+
+_application = None
+
+
+def _ensure_application():
+    ''' Create a QGuiApplication to paint with, on the offscreen platform, unless there already is one '''
+    global _application
+    if QGuiApplication.instance() is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        _application = QGuiApplication([])
+
+
+def record_trace(game):
+    ''' Play 'game' to the end, returning its trace '''
+    def frame(game):
+        return tuple((game.position[player].x, game.position[player].y) for player in game.players)
+
+    trace = [frame(game)]
+    game.play(hook=lambda game: trace.append(frame(game)))
+    return trace
+
+
+class FrameRenderer(object):
+    ''' Draws frames of games in a maze, 'cell_size' pixels to a cell, with a border of walls around the maze '''
+
+    def __init__(self, maze, cell_size=8):
+        if cell_size < 1:
+            raise ValueError("'cell_size' must be positive, got: {}".format(cell_size))
+        _ensure_application()
+        self.maze = maze
+        self.cell_size = cell_size
+
+        # Image row 0 is the top border, and row 'height' is maze row y = 0
+        walls = np.ones((maze.height + 2, maze.width + 2), dtype=bool)
+        cells = np.frombuffer(maze.cell_bytes(), dtype=np.uint8).reshape(maze.height, maze.width)
+        walls[1:-1, 1:-1] = cells[::-1] == Maze.wall
+        pixels = np.where(walls, np.uint32(WALL_COLOUR), np.uint32(BACKGROUND_COLOUR)).astype(np.uint32)
+        pixels = np.ascontiguousarray(pixels.repeat(cell_size, axis=0).repeat(cell_size, axis=1))
+        self.background = QImage(pixels.tobytes(), pixels.shape[1], pixels.shape[0], pixels.shape[1] * 4,
+                                 QImage.Format_RGB32).copy()
+
+    def render(self, frame):
+        ''' Return a QImage of the players at the positions in 'frame' (see record_trace) '''
+        image = self.background.copy()
+        painter = QPainter(image)
+        painter.setPen(Qt.NoPen)  # Not antialiased, so frames only contain the PALETTE colours
+        cell, height = self.cell_size, self.maze.height
+        for (x, y), colour in zip(frame, PLAYER_COLOURS):
+            painter.setBrush(QColor.fromRgb(colour))
+            painter.drawEllipse(QRect((x + 1) * cell, (height - y) * cell, cell, cell))
+        painter.end()
+        return image
+
+
+def _indexed(image):
+    ''' Return a copy of a frame with 8 bits a pixel. Frames only contain the PALETTE colours, so this is exact. '''
+    return image.convertToFormat(QImage.Format_Indexed8, list(PALETTE), Qt.ThresholdDither)
+
+
+def _write_pngs(images, directory):
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for count, image in enumerate(images, 1):
+        path = os.path.join(directory, "frame-{:06d}.png".format(count - 1))
+        if not _indexed(image).save(path, "PNG"):
+            raise IOError("Couldn't write {}".format(path))
+    return count
+
+
+def _write_gif(images, path, frame_ms):
+    from PIL import GifImagePlugin, Image  # Only needed for GIFs
+    palette = [channel for rgb in PALETTE for channel in ((rgb >> 16) & 0xFF, (rgb >> 8) & 0xFF, rgb & 0xFF)]
+    transparent = len(PALETTE)  # An extra colour, for the pixels a frame leaves as they were
+    palette += [0, 0, 0]
+
+    def gif_frame(pixels):
+        height, width = pixels.shape
+        frame = Image.frombuffer("P", (width, height), np.ascontiguousarray(pixels).tobytes(), "raw", "P", 0, 1)
+        frame.putpalette(palette)
+        return frame
+
+    count = 0
+    previous = None
+    with open(path, "wb") as stream:
+        for count, image in enumerate(images, 1):
+            indexed = _indexed(image)
+            bits = indexed.constBits()
+            bits.setsize(indexed.sizeInBytes())
+            pixels = np.frombuffer(bits, dtype=np.uint8).reshape(indexed.height(), indexed.bytesPerLine())
+            pixels = pixels[:, :indexed.width()].copy()
+            if previous is None:
+                frame, offset = gif_frame(pixels), (0, 0)
+                header, _palette = GifImagePlugin.getheader(frame, info={"loop": 0, "duration": frame_ms})
+                stream.write(b"".join(header))
+                options = {}
+            else:
+                # Frames are drawn over the one before, so only the rectangle that changed needs writing, and within
+                # it the pixels that didn't change can be transparent - which compresses much better. A frame that
+                # didn't change at all still needs a pixel, to keep the timing.
+                changed = pixels != previous
+                rows, columns = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+                top, bottom = (rows[0], rows[-1] + 1) if rows.size else (0, 1)
+                left, right = (columns[0], columns[-1] + 1) if columns.size else (0, 1)
+                area = np.s_[top:bottom, left:right]
+                frame = gif_frame(np.where(changed[area], pixels[area], np.uint8(transparent)))
+                offset = (int(left), int(top))
+                options = {"transparency": transparent}
+            stream.write(b"".join(GifImagePlugin.getdata(frame, offset, duration=frame_ms, **options)))
+            previous = pixels
+        stream.write(b";")  # The GIF trailer
+    if not count:
+        os.remove(path)
+        raise ValueError("There are no frames to write")
+    return count
+
+
+def export_trace(maze, trace, path, cell_size=8, step=1, frame_ms=50):
+    ''' Render every step'th frame of 'trace' (always including the last), and write them to 'path' - an animated GIF
+        if it ends with ".gif", otherwise a directory of PNGs named frame-000000.png onwards.
+        'frame_ms' is the GIF's delay between frames, in milliseconds. Returns the number of frames written.
+    '''
+    if step < 1:
+        raise ValueError("'step' must be positive, got: {}".format(step))
+    renderer = FrameRenderer(maze, cell_size)
+    frames = trace[::step]
+    if (len(trace) - 1) % step:
+        frames.append(trace[-1])
+    images = (renderer.render(frame) for frame in frames)
+    if path.lower().endswith(".gif"):
+        return _write_gif(images, path, frame_ms)
+    return _write_pngs(images, path)
+
+
+def export_game(game, path, cell_size=8, step=1, frame_ms=50):
+    ''' Play 'game' to the end (see record_trace), and export it (see export_trace). Returns the game's result, and
+        the number of frames written.
+    '''
+    if game.status not in (Game.not_started, Game.in_play):
+        raise ValueError("The game is already over")
+    trace = record_trace(game)
+    return game.status, export_trace(game.maze, trace, path, cell_size, step, frame_ms)
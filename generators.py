@@ -0,0 +1,51 @@
+'''
+    generators.py
+
+    Functions that generate mazes. Each takes an optional 'seed', and uses its own random number generator, so
+    generating a maze doesn't disturb the seeded games played in it.
+
+        random_maze - each cell is independently a wall, with a given probability
+        perfect_maze - a maze with exactly one path between any two of its open cells, carved by a depth-first search
+'''
+
+import random
+
+from maze import Maze
+
+
+def _from_rows(rows):
+    ''' Build a Maze from a list of rows of 0's and 1's, indexed [y][x] '''
+    return Maze(len(rows[0]), len(rows), "".join("".join(map(str, row)) for row in reversed(rows)))
+
+
+def random_maze(width, height, density=0.25, seed=None):
+    ''' Return a maze in which each cell is a wall with probability 'density' '''
+    if not 0 <= density <= 1:
+        raise ValueError("'density' must be between 0 and 1, got: {}".format(density))
+    rng = random.Random(seed)
+    return _from_rows([[Maze.wall if rng.random() < density else Maze.space for _ in range(width)]
+                       for _ in range(height)])
+
+
+def perfect_maze(width, height, seed=None):
+    ''' Return a maze of corridors one cell wide, with exactly one path between any two open cells.
+        Open cells are at even coordinates, joined through the odd cells between them.
+    '''
+    if width < 1 or height < 1:
+        raise ValueError("width and height must be positive. Got {} and {}".format(width, height))
+    rng = random.Random(seed)
+    rows = [[Maze.wall] * width for _ in range(height)]
+    rows[0][0] = Maze.space
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        options = [(dx, dy) for dx, dy in ((0, 2), (-2, 0), (0, -2), (2, 0))
+                   if 0 <= x + dx < width and 0 <= y + dy < height and rows[y + dy][x + dx] == Maze.wall]
+        if not options:
+            stack.pop()
+            continue
+        dx, dy = rng.choice(options)
+        rows[y + dy // 2][x + dx // 2] = Maze.space
+        rows[y + dy][x + dx] = Maze.space
+        stack.append((x + dx, y + dy))
+    return _from_rows(rows)
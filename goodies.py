@@ -6,25 +6,28 @@
 
 import random
 
-from maze import Goody, UP, DOWN, LEFT, RIGHT, STAY, PING, Position
-from maze import STEP
+from maze import Goody, TabularPolicy, UP, DOWN, LEFT, RIGHT, STAY, PING, Position
+from maze import STEP, MASK_BIT
 
 OPPOSITE = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
 
-class StaticGoody(Goody):
+class StaticGoody(TabularPolicy, Goody):
     ''' A static goody - does not move from its initial position '''
 
-    def take_turn(self, _obstruction, _ping_response):
+    @classmethod
+    def move_distribution(cls, _mask, _pinged):
         ''' Stay where we are '''
-        return STAY
+        return {STAY: 1}
 
-class RandomGoody(Goody):
+class RandomGoody(TabularPolicy, Goody):
     ''' A random-walking goody '''
 
-    def take_turn(self, obstruction, _ping_response):
+    @classmethod
+    def move_distribution(cls, mask, _pinged):
         ''' Ignore any ping information, just choose a random direction to walk in, or ping '''
-        possibilities = [direction for direction in [UP, DOWN, LEFT, RIGHT] if not obstruction[direction]] + [PING]
-        return random.choice(possibilities)
+        possibilities = {direction: 1 for direction in [UP, DOWN, LEFT, RIGHT] if not mask & MASK_BIT[direction]}
+        possibilities[PING] = 1
+        return possibilities
 
 
 class TPWGoody(Goody):
@@ -33,6 +36,10 @@ class TPWGoody(Goody):
     It also remembers dead ends and consider them as walls '''
 
     def __init__(self):
+        self.reset()
+
+    def reset(self):
+        ''' Forget everything we have learnt about the maze '''
         self.turn = 1
         self.position = Position(0, 0)  # Goody's position relative to its initial point.
         self.known_walls = []
@@ -6,7 +6,7 @@
 from collections import defaultdict
 
 from PyQt5.QtCore import QTimer
-from PyQt5.QtGui import QBrush, QColor, QPen, QPixmap
+from PyQt5.QtGui import QBrush, QColor, QImage, QPen, QPixmap
 from PyQt5.QtWidgets import (QFormLayout, QGraphicsScene, QGraphicsView, QHBoxLayout, QLabel, QLineEdit, QPushButton,
                              QVBoxLayout, QWidget, QCheckBox)
 
@@ -30,6 +30,9 @@ class GameViewer(QWidget):
 
     ping_brush = QBrush(QColor("white"))
 
+    heatmap_colour = QColor("orange")
+    heatmap_opacity = 200  # Alpha of the busiest cell, out of 255
+
     def __init__(self):
         super(GameViewer, self).__init__()
 
@@ -41,6 +44,9 @@ class GameViewer(QWidget):
         self.goody1 = None
         self.baddy = None
         self.ping_marker = {}
+        self.heatmap = None
+        self.heatmap_layers = None
+        self.heatmap_item = None
         self.results = defaultdict(int)
         self.round_timer = QTimer(interval=50, timeout=self._play)  # milliseconds
         self.running = False
@@ -56,6 +62,7 @@ class GameViewer(QWidget):
         self.baddy_wins_count = QLineEdit(readOnly=True)
 
         self.auto_start = QCheckBox("Auto-start new game", checked=True)
+        self.show_heatmap = QCheckBox("Show heatmap", checked=True, enabled=False, toggled=self._show_heatmap)
 
         self.new_game_button = QPushButton("&New Game", clicked=self.new_game, enabled=False)
         self.step_button = QPushButton("S&tep", clicked=self.do_round, enabled=False)
@@ -107,6 +114,7 @@ class GameViewer(QWidget):
         layout.addLayout(legend_layout)
         layout.addLayout(info_layout)
         layout.addWidget(self.auto_start)
+        layout.addWidget(self.show_heatmap)
         layout.addLayout(buttons_layout)
 
 
@@ -143,6 +151,10 @@ class GameViewer(QWidget):
                 if game.maze[x, y] == Maze.wall:
                     self.scene.addRect(x * cell, y * cell, cell, cell, pen=self.wall_pen, brush=self.wall_brush)
 
+        # Add the heatmap, underneath everything else
+        self.heatmap_item = None
+        self._draw_heatmap()
+
         # Add the players
         goody0_pos = game.position[game.goody0]
         goody1_pos = game.position[game.goody1]
@@ -175,6 +187,46 @@ class GameViewer(QWidget):
         self.setWindowTitle("{} and {} vs. {}".format(type(game.goody0).__name__, type(game.goody1).__name__,
                                                       type(game.baddy).__name__))
 
+    def set_heatmap(self, heatmap, layers=None):
+        ''' Show an analytics.Heatmap (the sum of the given layers - by default, the players' ones) under the maze.
+            Games played in the viewer are recorded in it too. Pass None to remove it.
+        '''
+        if layers is None:
+            from analytics import ROLES  # Needs NumPy, so only imported when a heatmap is shown
+            layers = ROLES
+        self.heatmap = heatmap
+        self.heatmap_layers = layers
+        self.show_heatmap.setEnabled(heatmap is not None)
+        if heatmap is None and self.heatmap_item is not None:
+            self.scene.removeItem(self.heatmap_item)
+            self.heatmap_item = None
+        self._draw_heatmap()
+
+    def _draw_heatmap(self):
+        ''' Private - (re)draw the heatmap as a single image, one pixel per cell, scaled up to the cell size '''
+        if self.heatmap is None or self.scene is None:
+            return
+        import numpy as np  # Only needed for heatmaps
+        values = self.heatmap.normalised(self.heatmap_layers)
+        height, width = values.shape
+        colour = self.heatmap_colour
+        # Format_ARGB32 pixels are 0xAARRGGBB. Image row r is maze row y = r, since the view is flipped vertically.
+        pixels = (((values * self.heatmap_opacity).astype(np.uint32) << 24) |
+                  np.uint32((colour.red() << 16) | (colour.green() << 8) | colour.blue()))
+        image = QImage(pixels.tobytes(), width, height, width * 4, QImage.Format_ARGB32).copy()
+        if self.heatmap_item is None:
+            self.heatmap_item = self.scene.addPixmap(QPixmap.fromImage(image))
+            self.heatmap_item.setScale(self.cell_size)
+            self.heatmap_item.setZValue(-2)
+            self.heatmap_item.setVisible(self.show_heatmap.isChecked())
+        else:
+            self.heatmap_item.setPixmap(QPixmap.fromImage(image))
+
+    def _show_heatmap(self, checked):
+        ''' Private - called when the "Show heatmap" check box is toggled '''
+        if self.heatmap_item is not None:
+            self.heatmap_item.setVisible(checked)
+
     def set_game_generator(self, game_generator):
         ''' Set the game generator (a generator of Game instances) that the GUI can take from '''
         self.game_generator = game_generator
@@ -229,6 +281,8 @@ class GameViewer(QWidget):
         if game is None:
             return
         result = game.do_round()
+        if self.heatmap is not None:
+            self.heatmap(game)
         for graphic, player in ((self.goody0, game.goody0), (self.goody1, game.goody1), (self.baddy, game.baddy)):
             new_pos = game.position[player]
             new_x = new_pos.x * self.cell_size
@@ -241,6 +295,7 @@ class GameViewer(QWidget):
 
         if result != Game.in_play:
             self.results[result] += 1
+            self._draw_heatmap()
         if not self.running:
             self._update_widgets()
         self.round.setText(str(self.game.round))
@@ -5,6 +5,9 @@
 
     This defines the Player abstract base class and to derived classes - Goody and Baddy.
 
+    TabularPolicy is an optional Player base for players whose moves depend only on the obstruction mask (and
+    whether a ping response arrived). The Game samples their moves from a PolicyTable without calling them.
+
     It also defines the game-playing classes:
         Maze - a container for holding the layout of a maze (walls and spaces) and for asking questions about
                particular positions in the maze
@@ -13,6 +16,8 @@
             UP, DOWN, LEFT, RIGHT, STAY, 
         Obstruction - a dict-like object, subscriptable by a Move, used to inform a player of their surroundings
 
+        PolicyTable - precomputed cumulative move distributions, indexed by obstruction mask and ping state
+
         Position - a two-dimensional vector that supports some binary operations, and l1 norm, which might be helpful.
 
         Game - A class responsible for placing the players within the maze, asking them to take their turn, and
@@ -22,11 +27,16 @@
         STEP, DX, DY, ZERO
         game_generator
         game_repeater
+
+    Run "python -m maze --help" for the command line, which plays, benchmarks and compares players.
 '''
 
+import hashlib
+import itertools
 import random
-import unittest
+import weakref
 
+from bisect import bisect
 from abc import ABC, abstractmethod
 
 
@@ -117,6 +127,10 @@ DX = Position(1, 0)
 DY = Position(0, 1)
 STEP = {UP: DY, LEFT: -DX, DOWN: -DY, RIGHT: DX, STAY: ZERO}
 
+# Bits of an obstruction mask - a wall in a given direction sets the corresponding bit
+MASK_BIT = {UP: 1, LEFT: 2, DOWN: 4, RIGHT: 8}
+MASK_COUNT = 16  # Number of distinct obstruction masks
+
 def _cell_str(value):
     ''' Private function, used when printing mazes '''
     return "X" if value else " "
@@ -128,6 +142,12 @@ class Obstruction(object):
     '''
     def __init__(self, up, left, down, right):
         self._state = {UP: up, LEFT: left, DOWN: down, RIGHT: right}
+        self.mask = sum(bit for direction, bit in MASK_BIT.items() if self._state[direction])
+
+    @classmethod
+    def from_mask(cls, mask):
+        ''' Return the shared Obstruction for an obstruction mask (see MASK_BIT) '''
+        return _OBSTRUCTIONS[mask]
 
     def __getitem__(self, key):
         if not isinstance(key, Move):
@@ -141,6 +161,11 @@ class Obstruction(object):
                           "." +            _cell_str(self[DOWN])       + "."])
 
 
+# One shared, read-only Obstruction per mask, so that the game doesn't have to build a new one every turn
+_OBSTRUCTIONS = tuple(Obstruction(*(bool(mask & MASK_BIT[direction]) for direction in (UP, LEFT, DOWN, RIGHT)))
+                      for mask in range(MASK_COUNT))
+
+
 class Player(ABC):
     ''' Common base class for goodies and baddies '''
 
@@ -161,6 +186,108 @@ class Player(ABC):
         '''
         pass
 
+    def reset(self):
+        ''' Called when a Game is reset, so that this player can be reused for a new game.
+            Players that remember anything between turns should forget it here.
+        '''
+        pass
+
+    @classmethod
+    def can_recycle(cls):
+        ''' Whether a player can be reset and reused for a new game, and play exactly as a new one would: if it
+            overrides reset(), or is a TabularPolicy that doesn't override take_turn (and so keeps no state).
+            Anything else may remember things from one game in the next.
+        '''
+        if cls.reset is not Player.reset:
+            return True
+        return issubclass(cls, TabularPolicy) and cls.take_turn is TabularPolicy.take_turn
+
+class PolicyTable(object):
+    ''' Precomputed cumulative move distributions for a TabularPolicy.
+
+        There is one entry per obstruction mask and ping state (whether a ping response arrived this turn).
+        Each entry is a tuple of moves and a matching tuple of cumulative weights, so a move can be sampled
+        with a single call to random.random() and a bisection.
+    '''
+    __slots__ = ("_moves", "_cum_weights")
+
+    def __init__(self, distribution):
+        ''' 'distribution' is a callable taking (mask, pinged) and returning a dict mapping Move to weight '''
+        self._moves = []
+        self._cum_weights = []
+        for pinged in (False, True):
+            for mask in range(MASK_COUNT):
+                moves, cum_weights, total = [], [], 0
+                for move, weight in distribution(mask, pinged).items():
+                    if not isinstance(move, Move):
+                        raise TypeError("Policy distributions must map Moves to weights. Got: {}".format(move))
+                    if weight < 0:
+                        raise ValueError("Move weights must not be negative. Got {} for {}".format(weight, move))
+                    if weight:
+                        total += weight
+                        moves.append(move)
+                        cum_weights.append(total)
+                if not moves:
+                    # Nothing is possible (e.g. a random walker boxed in on all sides) - lose the turn
+                    moves, cum_weights = [STAY], [1]
+                self._moves.append(tuple(moves))
+                self._cum_weights.append(tuple(cum_weights))
+
+    def sample(self, mask, pinged=False):
+        ''' Randomly choose a move for the given obstruction mask and ping state '''
+        index = mask + MASK_COUNT if pinged else mask
+        moves = self._moves[index]
+        if len(moves) == 1:
+            return moves[0]  # Deterministic - don't consume any randomness
+        cum_weights = self._cum_weights[index]
+        return moves[bisect(cum_weights, random.random() * cum_weights[-1], 0, len(moves) - 1)]
+
+    def distribution(self, mask, pinged=False):
+        ''' Return the move probabilities for the given obstruction mask and ping state, as a dict '''
+        index = mask + MASK_COUNT if pinged else mask
+        cum_weights = self._cum_weights[index]
+        total = cum_weights[-1]
+        previous = 0
+        result = {}
+        for move, cumulative in zip(self._moves[index], cum_weights):
+            result[move] = (cumulative - previous) / total
+            previous = cumulative
+        return result
+
+
+class TabularPolicy(Player):
+    ''' A player whose move distribution depends only on the obstruction mask around it, and on whether a ping
+        response arrived this turn.
+
+        Derived classes implement the classmethod move_distribution(mask, pinged), returning a dict mapping Move to
+        a (relative) weight. The resulting PolicyTable is built once per class, and a Game samples moves from it
+        directly instead of calling take_turn - unless a derived class overrides take_turn.
+
+        Use it as the first base class, e.g. class RandomBaddy(TabularPolicy, Baddy)
+    '''
+
+    @classmethod
+    @abstractmethod
+    def move_distribution(cls, mask, pinged):
+        ''' Return a dict mapping Move to weight for the given obstruction mask (see MASK_BIT), and whether a ping
+            response was received this turn. Moves with zero weight are never chosen.
+        '''
+        pass
+
+    @classmethod
+    def policy_table(cls):
+        ''' Return the (cached) PolicyTable for this class '''
+        table = cls.__dict__.get("_policy_table")
+        if table is None:
+            table = PolicyTable(cls.move_distribution)
+            cls._policy_table = table
+        return table
+
+    def take_turn(self, obstruction, ping_response):
+        ''' Sample a move from the policy table - equivalent to what the Game does without calling us '''
+        return self.policy_table().sample(obstruction.mask, ping_response is not None)
+
+
 class Goody(Player):
     ''' A Goody.
 
@@ -201,6 +328,9 @@ class Maze(object):
 
         The state of a cell can be interrogated by subscripting the object with an (x, y) pair, or a Position object
         e.g. maze[4, 5]  # -> Maze.space (== 0) or Maze.wall (== 1)
+
+        Data derived from the layout (obstruction masks, empty cells, ...) is shared between all mazes with the same
+        contents - see derived() and cache.py
     '''
     space = 0
     wall  = 1
@@ -228,6 +358,9 @@ class Maze(object):
             self._cells.append(row)
         self._cells.reverse()
 
+        self._content_hash = None  # Computed on demand, and forgotten whenever a cell changes
+        self._derived = None
+
     def __getitem__(self, index):
         if isinstance(index, tuple):
             if len(index) != 2:
@@ -251,6 +384,8 @@ class Maze(object):
             raise IndexError("{} is out of bounds (0-{}, 0-{})".format(index, self.width - 1, self.height - 1))
 
         self._cells[index.y][index.x] = value
+        self._content_hash = None
+        self._derived = None
 
     def __str__(self):
         parts = ["X" * (self.width + 2)]  # Top border
@@ -263,22 +398,70 @@ class Maze(object):
         return "{}({}, {}, {})".format(type(self).__name__, self.width, self.height,
                                        "".join(str(cell) for row in self._cells for cell in row))
 
+    @classmethod
+    def from_text(cls, text):
+        ''' Create a maze from text, either:
+              rows of 0's and 1's, top row first (like the 'data' argument of Maze), or
+              rows of "X" and " ", surrounded by a border of X's (as printed by str(maze))
+        '''
+        rows = [row.rstrip("\r") for row in text.strip("\n").split("\n")]
+        if rows and set("".join(rows)) <= set("X "):
+            if (set(rows[0]) != {"X"} or set(rows[-1]) != {"X"} or
+                    any(not row.startswith("X") or not row.endswith("X") for row in rows)):
+                raise ValueError("A maze drawn with X's must be surrounded by a border of X's")
+            rows = ["".join("1" if cell == "X" else "0" for cell in row[1:-1]) for row in rows[1:-1]]
+        rows = [row.strip() for row in rows]
+        if not rows or not rows[0] or any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError("A maze must have one or more rows, all of the same length")
+        return cls(len(rows[0]), len(rows), "".join(rows))
+
     def __getstate__(self):
         return (self.width, self.height, self._cells)
 
     def __setstate__(self, state):
         self.width, self.height, self._cells = state
+        self._content_hash = None
+        self._derived = None
+
+    def content_hash(self):
+        ''' Return a hex digest identifying the size and contents of this maze '''
+        if self._content_hash is None:
+            digest = hashlib.sha1("{}x{}:".format(self.width, self.height).encode("ascii"))
+            for row in self._cells:
+                digest.update(bytes(row))
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def cell_bytes(self):
+        ''' Return the cells as a bytes object, indexed by y * width + x '''
+        return b"".join(map(bytes, self._cells))
+
+    def derived(self):
+        ''' Return the cache.MazeData for this maze's current contents, from the default cache '''
+        # Only a weak reference is kept here, so that data evicted from the cache can be freed
+        data = None if self._derived is None else self._derived()
+        if data is None:
+            from cache import default_cache  # Imported here as cache.py depends on this module
+            data = default_cache().get(self)
+            self._derived = weakref.ref(data)
+        return data
 
     def obstruction(self, position):
         ''' Returns an Obstruction object for the given x, y position '''
-        return Obstruction(bool(self[position + STEP[UP]]),
-                           bool(self[position + STEP[LEFT]]),
-                           bool(self[position + STEP[DOWN]]),
-                           bool(self[position + STEP[RIGHT]]))
+        return Obstruction.from_mask(self.obstruction_mask(Position._convert(position)))
+
+    def obstruction_mask(self, position):
+        ''' Returns the obstruction mask (see MASK_BIT) for the given Position '''
+        if 0 <= position.x < self.width and 0 <= position.y < self.height:
+            return self.derived().masks[position.y * self.width + position.x]
+        return ((self[position + STEP[UP]] and MASK_BIT[UP]) |
+                (self[position + STEP[LEFT]] and MASK_BIT[LEFT]) |
+                (self[position + STEP[DOWN]] and MASK_BIT[DOWN]) |
+                (self[position + STEP[RIGHT]] and MASK_BIT[RIGHT]))
 
     def empty_cells(self):
         ''' Return the number of empty cells in this maze '''
-        return sum(not cell for row in self._cells for cell in row)
+        return self.derived().empty_count
 
     def __mul__(self, other):
         ''' Multiply a maze by a (x, y) tuple - return a new maze that is this one repeated 'x' times in the
@@ -320,6 +503,13 @@ class Game(object):
 
         self.players = (self.goody0, self.goody1, self.baddy)
 
+        # Players with a TabularPolicy have their moves sampled from a table, rather than being called - unless
+        # they override take_turn, which must then be called as usual
+        self._tables = {player: type(player).policy_table()
+                        if isinstance(player, TabularPolicy) and type(player).take_turn is TabularPolicy.take_turn
+                        else None
+                        for player in self.players}
+
         self.position = {}  # a dict mapping player to Position
         self._place_players()
 
@@ -328,6 +518,19 @@ class Game(object):
         self.ping = False  # Whether a ping should be triggered at the start of the next round
         self.status = Game.not_started
 
+    def reset(self):
+        ''' Start a new game with the same maze and players, as if this Game had just been constructed.
+            Each player's reset() method is called, then the players are placed at new random positions.
+        '''
+        for player in self.players:
+            player.reset()
+        self.position = {}
+        self._place_players()
+
+        self.round = 0
+        self.ping = False
+        self.status = Game.not_started
+
     def _place_players(self):
         ''' Randomly place the two goodies and the baddy in the maze '''
         taken = []
@@ -373,12 +576,16 @@ class Game(object):
             ping_response = dict.fromkeys(self.players, None)
 
         for player in self.players:
-            obstruction = self.maze.obstruction(self.position[player])
-            action = player.take_turn(obstruction, ping_response[player])
+            mask = self.maze.obstruction_mask(self.position[player])
+            table = self._tables[player]
+            if table is not None:
+                action = table.sample(mask, ping_response[player] is not None)
+            else:
+                action = player.take_turn(Obstruction.from_mask(mask), ping_response[player])
 
             # Handle the cases that result in no action
             if (action == STAY or
-                action in (UP, DOWN, LEFT, RIGHT) and obstruction[action] or
+                action in MASK_BIT and mask & MASK_BIT[action] or
                 action == PING and isinstance(player, Baddy)):
                 continue
 
@@ -439,40 +646,27 @@ def game_generator(mazes, goody0s, goody1s, baddies, max_rounds=10000):
     for maze, goody0, goody1, baddy in zip(mazes, goody0s, goody1s, baddies):
         yield Game(maze, goody0, goody1, baddy, max_rounds=max_rounds)
 
-def game_repeater(maze, goody0_cls, goody1_cls, baddy_cls, max_rounds=10000)        :
-    ''' A generator of instances of identical games '''
-    while True:
-        yield Game(maze, goody0_cls(), goody1_cls(), baddy_cls(), max_rounds=max_rounds)
-
-
-class PositionTest(unittest.TestCase):
-    ''' Test that the Position class is functioning as expected '''
-
-    def setUp(self):
-        ''' Define a couple of position objects to use in tests '''
-        self.pos1 = Position(5, 7)
-        self.pos2 = Position(-4, 9)
-
-    def test_addition(self):
-        self.assertEqual(self.pos1 + self.pos2, Position(1, 16))
-
-    def test_subtraction(self):
-        self.assertEqual(self.pos1 - self.pos2, Position(9, -2))
-
-    def test_negation(self):
-        self.assertEqual(-self.pos1, Position(-5, -7))
-
-    def test_equality(self):
-        self.assertTrue(self.pos1 == self.pos1)
-
-    def test_l1_norm(self):
-        self.assertTrue(self.pos1.l1_norm() == 12)
-        self.assertTrue(self.pos2.l1_norm() == 13)
-
-    def test_inequality(self):
-        self.assertTrue(self.pos1 != self.pos2)
+def game_repeater(maze, goody0_cls, goody1_cls, baddy_cls, max_rounds=10000, recycle=False, seeds=None):
+    ''' A generator of instances of identical games.
+        If 'recycle' is True, a single Game (and its players) is reset and yielded again each time instead of
+        constructing new ones. Each game must be finished with before the next one is requested. Only recycle
+        players that reset themselves properly (see Player.can_recycle).
+        If 'seeds' is given, the random module is seeded with each of them in turn before each game is set up,
+        and the generator stops when they run out. Otherwise it never stops.
+    '''
+    game = None
+    for seed in itertools.repeat(None) if seeds is None else seeds:
+        if seed is not None:
+            random.seed(seed)
+        if game is None or not recycle:
+            game = Game(maze, goody0_cls(), goody1_cls(), baddy_cls(), max_rounds=max_rounds)
+        else:
+            game.reset()
+        yield game
 
 
 if __name__ == "__main__":
-    # Run the unittests in this script, with a nice level of output
-    unittest.main(verbosity=2)
+    # "python -m maze ..." runs the command line - see cli.py
+    import sys
+    from cli import main
+    sys.exit(main())
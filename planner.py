@@ -0,0 +1,176 @@
+'''
+    planner.py
+
+    DStarLite - an incremental shortest path planner on a 4-connected grid (Koenig & Likhachev's D* Lite).
+
+    The planner searches backwards from the goal, so as the start moves along the path and cells are discovered to
+    be blocked, only the part of the search affected by the change is redone - rather than searching from scratch
+    every turn. Cells that are not known to be blocked are assumed to be free.
+
+    Cells are (x, y) tuples, and every move between neighbouring cells costs 1.
+'''
+
+import heapq
+
+INFINITY = float("inf")
+HEURISTIC_WEIGHT = 1.001
+
+NEIGHBOUR_OFFSETS = ((0, 1), (-1, 0), (0, -1), (1, 0))  # up, left, down, right
+
+
+def _neighbours(cell):
+    x, y = cell
+    return [(x + dx, y + dy) for dx, dy in NEIGHBOUR_OFFSETS]
+
+
+def _heuristic(a, b):
+    ''' The l1 distance between two cells, scaled up very slightly. Among cells whose paths would be equally short,
+        this favours those nearer the start - otherwise an open area between the start and the goal would be
+        expanded in full. The paths found are at most HEURISTIC_WEIGHT times longer than the shortest.
+    '''
+    return (abs(a[0] - b[0]) + abs(a[1] - b[1])) * HEURISTIC_WEIGHT
+
+
+class DStarLite(object):
+    ''' An incremental planner for paths from 'start' to 'goal'.
+
+        'is_blocked' is a callable taking a cell and returning True if it can't be entered. When the answer changes
+        for some cells, pass them to blocked_changed().
+
+        The grid is unbounded, so if the goal is walled off a search could go on forever. compute() therefore takes a
+        limit on the number of cells to expand. The search state is kept when the limit is reached, so the next call
+        carries on where this one left off.
+    '''
+
+    def __init__(self, start, goal, is_blocked):
+        self.start = start
+        self.goal = goal
+        self.is_blocked = is_blocked
+        self.expansions = 0  # Total number of cells expanded - a measure of the work done
+        self.updates = 0     # Total number of changed cells passed on to the search by blocked_changed()
+
+        self._g = {}    # Cost of the path to the goal found so far - missing means infinity
+        self._rhs = {}  # One-step lookahead of _g
+        self._queue = []  # Heap of (key, cell), some of which may be stale
+        self._queued = {}  # Maps each queued cell to its current key
+        self._km = 0  # Accumulated heuristic change, as the start moves
+        self._last = start
+
+        self._rhs[goal] = 0
+        self._push(goal)
+
+    def _key(self, cell):
+        cost = min(self._g.get(cell, INFINITY), self._rhs.get(cell, INFINITY))
+        return (cost + _heuristic(self.start, cell) + self._km, cost)
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self._queued[cell] = key
+        heapq.heappush(self._queue, (key, cell))
+
+    def _top(self):
+        ''' Return the (key, cell) at the top of the queue, discarding stale entries, or None if it's empty '''
+        queue = self._queue
+        while queue:
+            key, cell = queue[0]
+            if self._queued.get(cell) == key:
+                return queue[0]
+            heapq.heappop(queue)
+        return None
+
+    def _update(self, cell):
+        ''' Recompute the lookahead cost of a cell, and queue it if it is inconsistent '''
+        g, rhs = self._g, self._rhs
+        if cell != self.goal:
+            is_blocked = self.is_blocked
+            best = INFINITY
+            if not is_blocked(cell):
+                x, y = cell
+                for neighbour in ((x, y + 1), (x - 1, y), (x, y - 1), (x + 1, y)):
+                    cost = g.get(neighbour, INFINITY)
+                    if cost < best and not is_blocked(neighbour):
+                        best = cost
+            if best == INFINITY:
+                rhs.pop(cell, None)
+            else:
+                rhs[cell] = best + 1
+        self._queued.pop(cell, None)
+        if g.get(cell, INFINITY) != rhs.get(cell, INFINITY):
+            self._push(cell)
+
+    def move_start(self, start):
+        ''' Tell the planner that the start has moved '''
+        self._km += _heuristic(self._last, start)
+        self._last = start
+        self.start = start
+
+    def affected(self, cells):
+        ''' Return those of 'cells' whose being blocked or not can change the search so far: the cells next to one
+            the search has reached, or that it has reached themselves. The others can be left out of blocked_changed().
+        '''
+        g, rhs, queued = self._g, self._rhs, self._queued
+        return [cell for cell in cells if cell in rhs or cell in queued or any(neighbour in g
+                                                                               for neighbour in _neighbours(cell))]
+
+    def blocked_changed(self, cells):
+        ''' Tell the planner that is_blocked() has changed for these cells '''
+        g = self._g
+        for cell in cells:
+            self.updates += 1
+            self._update(cell)
+            if cell in g:  # Otherwise the neighbours' costs didn't depend on it
+                for neighbour in _neighbours(cell):
+                    self._update(neighbour)
+
+    def compute(self, max_expansions=None):
+        ''' Continue the search until the shortest path from the start is known, or 'max_expansions' cells have been
+            expanded. Returns True if the search finished.
+        '''
+        g, rhs = self._g, self._rhs
+        expansions = 0
+        while True:
+            top = self._top()
+            start_key = self._key(self.start)
+            if top is None or (top[0] >= start_key and
+                               rhs.get(self.start, INFINITY) <= g.get(self.start, INFINITY)):
+                return True
+            if max_expansions is not None and expansions >= max_expansions:
+                return False
+            expansions += 1
+            self.expansions += 1
+
+            old_key, cell = heapq.heappop(self._queue)
+            del self._queued[cell]
+            new_key = self._key(cell)
+            if old_key < new_key:
+                self._push(cell)
+            elif g.get(cell, INFINITY) > rhs.get(cell, INFINITY):
+                g[cell] = rhs[cell]
+                for neighbour in _neighbours(cell):
+                    self._update(neighbour)
+            else:
+                g.pop(cell, None)
+                self._update(cell)
+                for neighbour in _neighbours(cell):
+                    self._update(neighbour)
+
+    def cost(self, cell):
+        ''' Return the cost of the best known path from 'cell' to the goal (infinity if none is known). When compute()
+            stops, the start's lookahead cost is up to date even if its own cost hasn't been settled, so use that.
+        '''
+        return self._rhs.get(cell, INFINITY)
+
+    def next_step(self):
+        ''' Return the neighbour of the start that is on the best known path to the goal, or None if there isn't one
+            (or the start is the goal)
+        '''
+        if self.start == self.goal:
+            return None
+        best, best_cost = None, INFINITY
+        for neighbour in _neighbours(self.start):
+            if self.is_blocked(neighbour):
+                continue
+            cost = self._g.get(neighbour, INFINITY) + 1
+            if cost < best_cost:
+                best, best_cost = neighbour, cost
+        return best
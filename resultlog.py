@@ -0,0 +1,204 @@
+'''
+    resultlog.py
+
+    An append-only, columnar log of game results.
+
+    Records are buffered in memory and written out in chunks, one NumPy .npy file per column per chunk:
+        <directory>/<column>-<chunk number>.npy
+    Text values (maze ids and player classes) are stored as integer codes into a table of strings, kept in
+        <directory>/strings.json
+
+    Columns:
+        seed    - the seed the game was played with (-1 if unknown)
+        maze    - code of the maze id (its content hash, unless another id was given)
+        goody0, goody1, baddy - codes of the player class paths
+        result  - index into RESULT_NAMES
+        rounds  - the number of rounds played
+        seconds - how long the game took, or NaN if it wasn't timed
+
+        ResultLog - the writer
+        load - read some columns from a log, memory-mapping the chunk files
+        iter_chunks - read some columns from a log one chunk at a time
+        strings - the table of strings a log's codes refer to
+'''
+
+import json
+import os
+import re
+import tempfile
+
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from maze import Maze, Game
+
+
+RESULT_NAMES = (Game.goodies_win, Game.baddy_wins, Game.draw)
+RESULT_CODES = {name: code for code, name in enumerate(RESULT_NAMES)}
+
+# Column name -> (array typecode, NumPy dtype)
+COLUMNS = OrderedDict([("seed",    ("q", np.int64)),
+                       ("maze",    ("i", np.int32)),
+                       ("goody0",  ("i", np.int32)),
+                       ("goody1",  ("i", np.int32)),
+                       ("baddy",   ("i", np.int32)),
+                       ("result",  ("b", np.int8)),
+                       ("rounds",  ("i", np.int32)),
+                       ("seconds", ("d", np.float64))])
+
+_STRINGS_FILE = "strings.json"
+_CHUNK_FILE = re.compile(r"^(?P<column>\w+)-(?P<chunk>\d+)\.npy$")
+
+
+def _chunk_path(directory, column, chunk):
+    return os.path.join(directory, "{}-{:06d}.npy".format(column, chunk))
+
+
+def _write_atomically(path, write):
+    ''' Call write(stream) on a temporary file, then move it to 'path' - so readers never see a partial file '''
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as stream:
+            write(stream)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class ResultLog(object):
+    ''' Writes game records to a log directory. Appending to an existing log adds new chunks after its old ones.
+
+        Records are buffered, and written out every 'chunk_size' records, and when the log is closed. Use it as a
+        context manager (or call close()) to make sure the last records are written.
+    '''
+
+    def __init__(self, directory, chunk_size=65536):
+        if chunk_size < 1:
+            raise ValueError("'chunk_size' must be positive, got: {}".format(chunk_size))
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+
+        self._strings = strings(directory)
+        self._codes = {string: code for code, string in enumerate(self._strings)}  # Also holds player classes
+        self._saved_strings = len(self._strings)
+        self._next_chunk = max(_complete_chunks(directory), default=-1) + 1
+        self._buffers = OrderedDict((column, array(typecode)) for column, (typecode, _) in COLUMNS.items())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def __len__(self):
+        ''' The number of records buffered, but not yet written '''
+        return len(self._buffers["seed"])
+
+    def _code(self, value):
+        ''' Return the string code for a Maze, player class (or instance), or string '''
+        if isinstance(value, Maze):
+            value = value.content_hash()
+        elif not isinstance(value, (str, type)):
+            value = type(value)
+        code = self._codes.get(value)
+        if code is None:
+            string = value if isinstance(value, str) else "{}.{}".format(value.__module__, value.__qualname__)
+            code = self._codes.get(string)
+            if code is None:
+                code = self._codes[string] = len(self._strings)
+                self._strings.append(string)
+            self._codes[value] = code
+        return code
+
+    def append(self, seed, maze, goody0, goody1, baddy, result, rounds, seconds=None):
+        ''' Add a record. 'maze' may be a Maze or an id string, and the players may be classes, instances, or class
+            paths. 'result' is one of the Game result strings. 'seed' may be None if unknown.
+        '''
+        buffers = self._buffers
+        buffers["seed"].append(-1 if seed is None else seed)
+        buffers["maze"].append(self._code(maze))
+        buffers["goody0"].append(self._code(goody0))
+        buffers["goody1"].append(self._code(goody1))
+        buffers["baddy"].append(self._code(baddy))
+        buffers["result"].append(RESULT_CODES[result])
+        buffers["rounds"].append(rounds)
+        buffers["seconds"].append(float("nan") if seconds is None else seconds)
+        if len(buffers["seed"]) >= self.chunk_size:
+            self.flush()
+
+    def record(self, seed, game, result=None, rounds=None, seconds=None):
+        ''' Add a record for a finished Game '''
+        self.append(seed, game.maze, game.goody0, game.goody1, game.baddy,
+                    game.status if result is None else result,
+                    game.round if rounds is None else rounds, seconds)
+
+    def flush(self):
+        ''' Write out any buffered records as a new chunk '''
+        if not len(self):
+            return
+        if len(self._strings) != self._saved_strings:
+            # The strings go first, so every complete chunk can be decoded
+            data = json.dumps(self._strings, indent=0).encode("utf-8")
+            _write_atomically(os.path.join(self.directory, _STRINGS_FILE), lambda stream: stream.write(data))
+            self._saved_strings = len(self._strings)
+        chunk = self._next_chunk
+        for column, (_, dtype) in COLUMNS.items():
+            buffer = self._buffers[column]
+            _write_atomically(_chunk_path(self.directory, column, chunk),
+                              lambda stream: np.save(stream, np.frombuffer(buffer, dtype=dtype), allow_pickle=False))
+            del buffer[:]
+        self._next_chunk += 1
+
+    def close(self):
+        self.flush()
+
+
+def strings(directory):
+    ''' Return the list of strings that a log's maze and player codes refer to '''
+    try:
+        with open(os.path.join(directory, _STRINGS_FILE), "rb") as stream:
+            return json.loads(stream.read().decode("utf-8"))
+    except FileNotFoundError:
+        return []
+
+
+def _complete_chunks(directory):
+    ''' Return the sorted numbers of the chunks that have a file for every column '''
+    columns_by_chunk = {}
+    for name in os.listdir(directory):
+        match = _CHUNK_FILE.match(name)
+        if match and match.group("column") in COLUMNS:
+            columns_by_chunk.setdefault(int(match.group("chunk")), set()).add(match.group("column"))
+    return sorted(chunk for chunk, columns in columns_by_chunk.items() if len(columns) == len(COLUMNS))
+
+
+def _check_columns(columns):
+    columns = list(COLUMNS) if columns is None else list(columns)
+    for column in columns:
+        if column not in COLUMNS:
+            raise ValueError("Unknown column {!r} - expected one of {}".format(column, list(COLUMNS)))
+    return columns
+
+
+def iter_chunks(directory, columns=None):
+    ''' Yield a dict of memory-mapped arrays for each chunk in a log, holding only the requested columns '''
+    columns = _check_columns(columns)
+    for chunk in _complete_chunks(directory):
+        yield {column: np.load(_chunk_path(directory, column, chunk), mmap_mode="r") for column in columns}
+
+
+def load(directory, columns=None):
+    ''' Return a dict mapping each requested column (default: all) to an array of its values over the whole log.
+        Only the requested columns' files are read. A log with a single chunk is returned memory-mapped.
+    '''
+    columns = _check_columns(columns)
+    chunks = list(iter_chunks(directory, columns))
+    if len(chunks) == 1:
+        return chunks[0]
+    return {column: (np.concatenate([chunk[column] for chunk in chunks]) if chunks else
+                     np.empty(0, dtype=COLUMNS[column][1]))
+            for column in columns}
@@ -0,0 +1,221 @@
+'''
+    sparse.py
+
+    SparseMaze - a Maze that only stores walls, for very large mazes that are mostly open space.
+
+    The maze is divided into square chunks of chunk_size * chunk_size cells. A chunk is only allocated once a wall is
+    put in it, and is freed again when its last wall is removed. So memory use depends on where the walls are, not
+    on the size of the maze, and counting the empty cells only needs to look at the allocated chunks.
+
+    It has the same interface as Maze, so it can be played in a Game, but some operations look at every cell, and
+    so are only practical for mazes of moderate size: str(), repr(), cell_bytes() and derived() (see cache.py).
+    derived() refuses mazes larger than max_derived_cells.
+'''
+
+import hashlib
+
+from maze import Maze, Position, MASK_BIT, UP, LEFT, DOWN, RIGHT
+
+
+class SparseMaze(Maze):
+    ''' A Maze that stores its walls in chunks, allocated only where there are walls.
+
+        'chunk_size' must be a power of two.
+
+        Unlike Maze, its content_hash() is computed from the allocated chunks rather than every cell, so it differs
+        from the hash of an equal Maze.
+    '''
+
+    max_derived_cells = 16 * 1024 * 1024  # See derived()
+
+    def __init__(self, width, height, data=None, chunk_size=64):
+        if not isinstance(width, int) or not isinstance(height, int):
+            raise TypeError("width and height must both be ints. Got {} and {}".format(width, height))
+        if not isinstance(chunk_size, int) or chunk_size < 1 or chunk_size & (chunk_size - 1):
+            raise ValueError("'chunk_size' must be a power of two, got: {}".format(chunk_size))
+        if data is not None:
+            if not isinstance(data, str):
+                raise TypeError("'data' must be a string, got: {}".format(data))
+            if len(data) != width * height:
+                raise ValueError("'data' must be a string of length {}, but it has length {}".format(
+                                 width * height, len(data)))
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self._shift = chunk_size.bit_length() - 1
+        self._chunks = {}       # (chunk x, chunk y) -> bytearray of chunk_size * chunk_size cells, indexed [y][x]
+        self._wall_counts = {}  # (chunk x, chunk y) -> number of walls in that chunk
+        self._content_hash = None
+        self._derived = None
+
+        if data is not None:
+            # Like Maze, 'data' lists the top row first
+            for index in (i for i, cell in enumerate(data) if cell != "0"):
+                if data[index] != "1":
+                    raise ValueError("'data' must only contain 0's and 1's, got: {!r}".format(data[index]))
+                self._set_wall(index % width, height - 1 - index // width)
+
+    @classmethod
+    def from_walls(cls, width, height, walls, chunk_size=64):
+        ''' Create a maze from an iterable of the positions of its walls '''
+        maze = cls(width, height, chunk_size=chunk_size)
+        for position in walls:
+            maze[position] = Maze.wall
+        return maze
+
+    @classmethod
+    def from_maze(cls, maze, chunk_size=64):
+        ''' Create a SparseMaze with the same contents as another maze '''
+        if isinstance(maze, SparseMaze):
+            return cls.from_walls(maze.width, maze.height, maze.walls(), chunk_size)
+        return cls.from_walls(maze.width, maze.height,
+                              (Position(x, y) for y in range(maze.height) for x in range(maze.width)
+                               if maze[x, y] == Maze.wall), chunk_size)
+
+    def _cell(self, x, y):
+        if not (0 <= x < self.width) or not (0 <= y < self.height):
+            return Maze.wall
+        chunk = self._chunks.get((x >> self._shift, y >> self._shift))
+        if chunk is None:
+            return Maze.space
+        mask = self.chunk_size - 1
+        return chunk[((y & mask) << self._shift) | (x & mask)]
+
+    def _set_wall(self, x, y):
+        key = (x >> self._shift, y >> self._shift)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._chunks[key] = bytearray(self.chunk_size * self.chunk_size)
+            self._wall_counts[key] = 0
+        mask = self.chunk_size - 1
+        offset = ((y & mask) << self._shift) | (x & mask)
+        if not chunk[offset]:
+            chunk[offset] = Maze.wall
+            self._wall_counts[key] += 1
+
+    def _set_space(self, x, y):
+        key = (x >> self._shift, y >> self._shift)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            return
+        mask = self.chunk_size - 1
+        offset = ((y & mask) << self._shift) | (x & mask)
+        if chunk[offset]:
+            chunk[offset] = Maze.space
+            self._wall_counts[key] -= 1
+            if not self._wall_counts[key]:
+                del self._chunks[key], self._wall_counts[key]
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            if len(index) != 2:
+                raise ValueError("index must be a Position or an x, y pair. Got: {}".format(index))
+            return self._cell(*index)
+        return self._cell(index.x, index.y)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            if len(index) != 2:
+                raise ValueError("index must be a Position or an x, y pair. Got: {}".format(index))
+            index = Position(*index)
+        if value not in (Maze.wall, Maze.space):
+            raise ValueError("value must be either Maze.space or Maze.wall")
+
+        if not (0 <= index.x < self.width) or not (0 <= index.y < self.height):
+            raise IndexError("{} is out of bounds (0-{}, 0-{})".format(index, self.width - 1, self.height - 1))
+
+        if value == Maze.wall:
+            self._set_wall(index.x, index.y)
+        else:
+            self._set_space(index.x, index.y)
+        self._content_hash = None
+        self._derived = None
+
+    def __str__(self):
+        parts = ["X" * (self.width + 2)]  # Top border
+        for y in reversed(range(self.height)):
+            parts.append("X" + "".join("X" if self._cell(x, y) else " " for x in range(self.width)) + "X")
+        parts.append(parts[0])  # Bottom border
+        return "\n".join(parts)
+
+    def __repr__(self):
+        cells = "".join(str(self._cell(x, y)) for y in reversed(range(self.height)) for x in range(self.width))
+        return "{}({}, {}, {}, chunk_size={})".format(type(self).__name__, self.width, self.height, cells,
+                                                      self.chunk_size)
+
+    def __getstate__(self):
+        return (self.width, self.height, self.chunk_size, self._chunks, self._wall_counts)
+
+    def __setstate__(self, state):
+        self.width, self.height, self.chunk_size, self._chunks, self._wall_counts = state
+        self._shift = self.chunk_size.bit_length() - 1
+        self._content_hash = None
+        self._derived = None
+
+    def content_hash(self):
+        ''' Return a hex digest identifying the size and contents of this maze '''
+        if self._content_hash is None:
+            digest = hashlib.sha1("sparse {}x{}/{}:".format(self.width, self.height, self.chunk_size).encode("ascii"))
+            for key in sorted(self._chunks):
+                digest.update("{},{}:".format(*key).encode("ascii"))
+                digest.update(self._chunks[key])
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def derived(self):
+        ''' Return the cache.MazeData for this maze, as Maze.derived() does. That holds a few bytes for every cell,
+            so it's refused for mazes of more than 'max_derived_cells' cells, rather than quietly using gigabytes.
+            A SparseMaze doesn't need it to be played in a Game.
+        '''
+        if self.width * self.height > self.max_derived_cells:
+            raise ValueError("A {}x{} SparseMaze is too large for derived() - it's limited to {} cells (see "
+                             "max_derived_cells)".format(self.width, self.height, self.max_derived_cells))
+        return super(SparseMaze, self).derived()
+
+    def cell_bytes(self):
+        ''' Return the cells as a bytes object, indexed by y * width + x. Needs a byte per cell. '''
+        cells = bytearray(self.width * self.height)
+        size = self.chunk_size
+        for (chunk_x, chunk_y), chunk in self._chunks.items():
+            x = chunk_x << self._shift
+            columns = min(size, self.width - x)
+            for row in range(min(size, self.height - (chunk_y << self._shift))):
+                start = ((chunk_y << self._shift) + row) * self.width + x
+                cells[start:start + columns] = chunk[row * size:row * size + columns]
+        return bytes(cells)
+
+    def obstruction_mask(self, position):
+        ''' Returns the obstruction mask (see MASK_BIT) for the given Position '''
+        x, y = position.x, position.y
+        return ((self._cell(x, y + 1) and MASK_BIT[UP]) |
+                (self._cell(x - 1, y) and MASK_BIT[LEFT]) |
+                (self._cell(x, y - 1) and MASK_BIT[DOWN]) |
+                (self._cell(x + 1, y) and MASK_BIT[RIGHT]))
+
+    def empty_cells(self):
+        ''' Return the number of empty cells in this maze. Only looks at the allocated chunks. '''
+        return self.width * self.height - sum(self._wall_counts.values())
+
+    def chunk_count(self):
+        ''' Return the number of chunks currently allocated '''
+        return len(self._chunks)
+
+    def walls(self):
+        ''' Yield the Position of every wall. Only looks at the allocated chunks. '''
+        for (chunk_x, chunk_y), chunk in self._chunks.items():
+            for offset in (offset for offset, cell in enumerate(chunk) if cell):
+                yield Position((chunk_x << self._shift) | (offset & (self.chunk_size - 1)),
+                               (chunk_y << self._shift) | (offset >> self._shift))
+
+    def __mul__(self, other):
+        ''' Multiply a maze by a (x, y) tuple - return a new maze that is this one repeated 'x' times in the
+            x directions and 'y' times in the y direction
+        '''
+        if not isinstance(other, tuple):
+            raise TypeError("Can only multiple a maze by an (x, y) tuple, got:{}".format(other))
+        x_repeats, y_repeats = other
+        walls = list(self.walls())
+        return type(self).from_walls(self.width * x_repeats, self.height * y_repeats,
+                                     (wall + (self.width * i, self.height * j)
+                                      for i in range(x_repeats) for j in range(y_repeats) for wall in walls),
+                                     self.chunk_size)
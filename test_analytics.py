@@ -0,0 +1,87 @@
+'''
+    test_analytics.py
+
+    Unit tests for analytics.py
+'''
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from analytics import Heatmap, LAYERS, ROLES
+from baddies import RandomBaddy
+from example import EXAMPLE_MAZE
+from goodies import RandomGoody
+from maze import Game, game_repeater
+
+
+def play(heatmap, seeds):
+    ''' Play seeded games into 'heatmap', returning the counts a per-round dict would have given '''
+    expected = {layer: np.zeros((EXAMPLE_MAZE.height, EXAMPLE_MAZE.width), dtype=np.int64) for layer in LAYERS}
+
+    def hook(game):
+        heatmap(game)
+        for role, player in zip(ROLES, game.players):
+            expected[role][game.position[player].y, game.position[player].x] += 1
+        if game.status == Game.baddy_wins:
+            expected["catch"][game.position[game.baddy].y, game.position[game.baddy].x] += 1
+        elif game.status == Game.goodies_win:
+            expected["meet"][game.position[game.goody0].y, game.position[game.goody0].x] += 1
+
+    results = [game.play(hook=hook)[0] for game in game_repeater(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy,
+                                                                 max_rounds=300, recycle=True, seeds=seeds)]
+    return expected, results
+
+
+class HeatmapTest(unittest.TestCase):
+    ''' Test the bulk counting against counting one round at a time '''
+
+    def test_counts(self):
+        heatmap = Heatmap(EXAMPLE_MAZE.width, EXAMPLE_MAZE.height, buffer_size=1000)
+        expected, results = play(heatmap, range(30))
+        for layer in LAYERS:
+            np.testing.assert_array_equal(heatmap.counts(layer), expected[layer])
+        self.assertEqual(heatmap.games, 30)
+        self.assertEqual(heatmap.counts("catch").sum(), results.count(Game.baddy_wins))
+        self.assertEqual(heatmap.counts("meet").sum(), results.count(Game.goodies_win))
+        self.assertRaises(ValueError, heatmap.counts, "ghost")
+
+    def test_wrong_size(self):
+        heatmap = Heatmap(EXAMPLE_MAZE.width + 1, EXAMPLE_MAZE.height)
+        game = next(game_repeater(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, seeds=[1]))
+        self.assertRaises(ValueError, game.play, hook=heatmap)
+        self.assertEqual(heatmap.counts("goody0").sum(), 0)
+
+    def test_normalised(self):
+        heatmap = Heatmap(EXAMPLE_MAZE.width, EXAMPLE_MAZE.height)
+        np.testing.assert_array_equal(heatmap.normalised(ROLES), 0)
+        play(heatmap, range(5))
+        values = heatmap.normalised(ROLES)
+        self.assertEqual(values.max(), 1)
+        self.assertEqual(values.min(), 0)  # Walls are never visited
+        self.assertTrue((heatmap.normalised("baddy") <= 1).all())
+
+    def test_merge_and_save(self):
+        whole = Heatmap(EXAMPLE_MAZE.width, EXAMPLE_MAZE.height)
+        first = Heatmap(EXAMPLE_MAZE.width, EXAMPLE_MAZE.height)
+        second = Heatmap(EXAMPLE_MAZE.width, EXAMPLE_MAZE.height)
+        play(whole, range(10))
+        play(first, range(5))
+        play(second, range(5, 10))
+        first.merge(second)
+        self.assertRaises(ValueError, first.merge, Heatmap(3, 3))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "heatmap.npz")
+            first.save(path)
+            loaded = Heatmap.load(path)
+        self.assertEqual(loaded.games, 10)
+        for layer in LAYERS:
+            np.testing.assert_array_equal(loaded.counts(layer), whole.counts(layer))
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
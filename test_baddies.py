@@ -0,0 +1,82 @@
+'''
+    test_baddies.py
+
+    Unit tests for baddies.py
+'''
+
+import random
+import unittest
+
+from maze import Game, Maze, Obstruction, Position, UP, DOWN, LEFT, RIGHT, MASK_BIT
+from baddies import PursuitBaddy, RandomBaddy
+from generators import perfect_maze
+from goodies import RandomGoody
+from tournament import run_matchup
+
+
+class PursuitBaddyTest(unittest.TestCase):
+    ''' Test that the pursuit baddy heads for pinged goodies '''
+
+    def test_heads_for_ping(self):
+        baddy = PursuitBaddy()
+        open_space = Obstruction.from_mask(0)
+        self.assertEqual(baddy.take_turn(open_space, {"goody0": Position(0, 5), "goody1": Position(-9, 0)}), UP)
+        self.assertEqual(baddy.take_turn(open_space, None), UP)
+
+    def test_goes_around_walls(self):
+        baddy = PursuitBaddy()
+        ping = {"goody0": Position(0, 3), "goody1": Position(20, 20)}
+        blocked_above = Obstruction.from_mask(MASK_BIT[UP] | MASK_BIT[LEFT])
+        self.assertEqual(baddy.take_turn(blocked_above, ping), RIGHT)
+        self.assertNotEqual(baddy.take_turn(Obstruction.from_mask(MASK_BIT[DOWN]), None), LEFT)
+
+    def test_reset(self):
+        baddy = PursuitBaddy()
+        baddy.take_turn(Obstruction.from_mask(MASK_BIT[UP]), {"goody0": Position(3, 0), "goody1": Position(4, 0)})
+        baddy.reset()
+        self.assertEqual((baddy.position, baddy.walls, baddy.planner, baddy.unblocked), ((0, 0), set(), None, []))
+
+    def test_turns_are_bounded(self):
+        ''' The work done in a turn - cells searched, and cells the planner is told have changed - stays within the
+            budget, however big the area the baddy knows about gets
+        '''
+        class SmallBudgetBaddy(PursuitBaddy):
+            max_expansions = 20
+
+        for size in (21, 101):
+            random.seed(1)
+            baddy = SmallBudgetBaddy()
+            last = [None, 0]  # The planner, and its total work, after the previous round
+            turns = []
+
+            def record(_game):
+                planner = baddy.planner
+                work = 0 if planner is None else planner.expansions + planner.updates
+                turns.append((work - last[1] if planner is last[0] else work, len(baddy.unblocked)))
+                last[:] = [planner, work]
+
+            Game(perfect_maze(size, size, seed=1), RandomGoody(), RandomGoody(), baddy, max_rounds=2000).play(
+                hook=record)
+            self.assertLessEqual(max(work for work, _waiting in turns), SmallBudgetBaddy.max_expansions)
+            if size > 21:
+                self.assertGreater(max(waiting for _work, waiting in turns), 0)  # Some updates had to wait
+
+    def test_beats_random_baddy(self):
+        maze = Maze(9, 9, "000000000"
+                          "011101110"
+                          "000100010"
+                          "010001010"
+                          "010111010"
+                          "010000010"
+                          "011101110"
+                          "000100000"
+                          "000000000")
+        pursuit = run_matchup(maze, RandomGoody, PursuitBaddy, range(100), max_rounds=500)
+        random_walk = run_matchup(maze, RandomGoody, RandomBaddy, range(100), max_rounds=500)
+        self.assertGreater(pursuit["baddy wins"], random_walk["baddy wins"])
+        self.assertLess(pursuit["rounds"], random_walk["rounds"])
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
@@ -0,0 +1,138 @@
+'''
+    test_cache.py
+
+    Unit tests for cache.py
+'''
+
+import os
+import tempfile
+import unittest
+import weakref
+
+from cache import MazeData, DerivedDataCache, default_cache, set_default_cache
+from generators import random_maze
+from maze import Maze, Position, MASK_BIT, UP, DOWN, LEFT, RIGHT
+
+
+class MazeDataTest(unittest.TestCase):
+    ''' Test the data derived from a maze '''
+
+    def setUp(self):
+        self.maze = Maze(4, 3, "0010"
+                               "1010"
+                               "0010")
+        self.data = MazeData(self.maze)
+
+    def test_masks(self):
+        for x in range(self.maze.width):
+            for y in range(self.maze.height):
+                self.assertEqual(self.data.masks[y * self.maze.width + x],
+                                 self.maze.obstruction(Position(x, y)).mask)
+
+    def test_empty_cells(self):
+        self.assertEqual(len(self.data.empty_cells), 8)
+        self.assertEqual(self.data.empty_count, 8)
+        self.assertEqual(self.maze.empty_cells(), 8)
+        positions = [self.data.position(index) for index in self.data.empty_cells]
+        self.assertIn(Position(0, 0), positions)
+        self.assertNotIn(Position(0, 1), positions)
+        self.assertTrue(all(self.maze[position] == Maze.space for position in positions))
+
+    def test_masks_match_cells(self):
+        maze = random_maze(23, 17, density=0.4, seed=5)
+        data = MazeData(maze)
+        for y in range(maze.height):
+            for x in range(maze.width):
+                position = Position(x, y)
+                expected = ((maze[position + (0, 1)] and MASK_BIT[UP]) |
+                            (maze[position + (-1, 0)] and MASK_BIT[LEFT]) |
+                            (maze[position + (0, -1)] and MASK_BIT[DOWN]) |
+                            (maze[position + (1, 0)] and MASK_BIT[RIGHT]))
+                self.assertEqual(data.masks[y * maze.width + x], expected)
+
+    def test_components(self):
+        self.assertFalse(self.data.connected((0, 0), (3, 0)))
+        self.assertTrue(self.data.connected((0, 0), (0, 2)))
+        self.assertTrue(self.data.connected((3, 0), (3, 2)))
+        self.assertEqual(len(set(self.data.components)), 3)  # Two areas, and the walls
+
+    def test_distances(self):
+        self.assertEqual(self.data.distance((1, 0), (1, 2)), 2)
+        self.assertEqual(self.data.distance((0, 0), (0, 2)), 4)
+        self.assertEqual(self.data.distance((0, 0), (3, 2)), -1)
+        self.assertEqual(self.data.distance((3, 0), (3, 2)), 2)
+        self.assertRaises(ValueError, self.data.distance_field, (2, 0))
+
+
+class DerivedDataCacheTest(unittest.TestCase):
+    ''' Test caching, invalidation, eviction, and the file-backed store '''
+
+    def test_equal_mazes_share_data(self):
+        cache = DerivedDataCache()
+        first = cache.get(Maze(3, 3, "010010010"))
+        second = cache.get(Maze(3, 3, "010010010"))
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_setitem_invalidates(self):
+        maze = Maze(3, 3)
+        before = maze.derived()
+        self.assertEqual(maze.empty_cells(), 9)
+        maze[1, 1] = Maze.wall
+        self.assertIsNot(maze.derived(), before)
+        self.assertEqual(maze.empty_cells(), 8)
+        self.assertEqual(maze.obstruction(Position(1, 0)).mask, MASK_BIT[UP] | MASK_BIT[DOWN])
+
+    def test_eviction(self):
+        mazes = [Maze(10, 10, "0" * n + "1" + "0" * (99 - n)) for n in range(5)]
+        cache = DerivedDataCache(max_bytes=MazeData(mazes[0]).nbytes() * 2)
+        for maze in mazes:
+            cache.get(maze)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+        self.assertIn(mazes[-1].content_hash(), cache)
+        self.assertNotIn(mazes[0].content_hash(), cache)
+
+    def test_evicted_data_is_freed(self):
+        mazes = [Maze(10, 10, "0" * n + "1" + "0" * (99 - n)) for n in range(3)]
+        cache = DerivedDataCache(max_bytes=MazeData(mazes[0]).nbytes())
+        first = cache.get(mazes[0])
+        reference = weakref.ref(first)
+        del first
+        for maze in mazes[1:]:
+            cache.get(maze)
+        self.assertIsNone(reference())
+
+        # Nor does a maze keep the data it was given alive
+        original = default_cache()
+        set_default_cache(cache)
+        try:
+            reference = weakref.ref(mazes[0].derived())
+            mazes[1].derived()
+            self.assertIsNone(reference())
+            self.assertEqual(mazes[0].empty_cells(), 99)  # Derived again
+        finally:
+            set_default_cache(original)
+
+    def test_growth_counts_towards_limit(self):
+        maze = Maze(10, 10)
+        cache = DerivedDataCache()
+        data = cache.get(maze)
+        before = cache.total_bytes
+        data.distance_field((0, 0))
+        self.assertEqual(cache.total_bytes, data.nbytes())
+        self.assertGreater(cache.total_bytes, before)
+
+    def test_file_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            maze = Maze(3, 3, "000010000")
+            DerivedDataCache(directory=directory).get(maze)
+            other = DerivedDataCache(directory=directory)
+            data = other.get(maze)
+            self.assertEqual(data.empty_cells, MazeData(maze).empty_cells)
+            self.assertEqual(os.listdir(directory), [maze.content_hash() + ".pickle"])
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
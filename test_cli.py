@@ -0,0 +1,123 @@
+'''
+    test_cli.py
+
+    Unit tests for cli.py
+'''
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from analytics import Heatmap, LAYERS
+from cli import load_mazes, load_player, main
+from generators import perfect_maze
+from maze import Goody, Baddy
+from goodies import TPWGoody
+
+
+class LoadTest(unittest.TestCase):
+    ''' Test the ways of naming mazes and players '''
+
+    def test_maze_file(self):
+        mazes = [perfect_maze(7, 5, seed=1), perfect_maze(5, 5, seed=2)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "mazes.txt")
+            with open(path, "w") as stream:
+                stream.write("\n\n".join(str(maze) for maze in mazes) + "\n")
+            loaded = load_mazes(path)
+        self.assertEqual([maze.content_hash() for maze in loaded], [maze.content_hash() for maze in mazes])
+
+    def test_maze_generator_call(self):
+        loaded = load_mazes("generators.perfect_maze(9, 7, seed=3)")
+        self.assertEqual([maze.content_hash() for maze in loaded], [perfect_maze(9, 7, seed=3).content_hash()])
+
+    def test_maze_dotted_path(self):
+        self.assertEqual(len(load_mazes("example.EXAMPLE_MAZE")), 1)
+        self.assertRaises(TypeError, load_mazes, "goodies.OPPOSITE")
+
+    def test_player(self):
+        self.assertIs(load_player("goodies.TPWGoody", Goody), TPWGoody)
+        self.assertRaises(TypeError, load_player, "goodies.TPWGoody", Baddy)
+
+
+class CommandTest(unittest.TestCase):
+    ''' Test running commands, as "python -m maze" would '''
+
+    def run_json(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(list(argv) + ["--json"]), 0)
+        return json.loads(output.getvalue())
+
+    def test_play(self):
+        first = self.run_json("play", "--seed", "4", "--max-rounds", "200")
+        self.assertEqual(first, self.run_json("play", "--seed", "4", "--max-rounds", "200"))
+
+    def test_stats_workers(self):
+        serial = self.run_json("stats", "--games", "40", "--max-rounds", "200", "--goody", "goodies.TPWGoody")
+        parallel = self.run_json("stats", "--games", "40", "--max-rounds", "200", "--goody", "goodies.TPWGoody",
+                                 "--workers", "2")
+        self.assertEqual(serial["games"], 40)
+        self.assertEqual(serial, parallel)
+
+    def test_bench_sparse(self):
+        result = self.run_json("bench", "--maze", "sparse.SparseMaze(10000, 10000)", "--games", "2",
+                               "--max-rounds", "50")
+        self.assertEqual(result["rounds"], 100)
+
+    def test_bad_counts(self):
+        for argv in (["stats", "--games", "0"], ["stats", "--workers", "0"], ["bench", "--max-rounds", "-1"],
+                     ["coordinate", "--workers", "-1"]):
+            with contextlib.redirect_stderr(io.StringIO()) as errors, self.assertRaises(SystemExit):
+                main(argv)
+            self.assertIn("must", errors.getvalue())
+
+    def test_bad_arguments(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for argv, message in ((["play", "--maze", "nosuch.thing"], "--maze nosuch.thing: No module named 'nosuch'"),
+                                  (["play", "--maze", "generators.perfect_maze(5,"], "--maze generators.perfect_maze"),
+                                  (["stats", "--goody", "baddies.RandomBaddy"], "is not a Goody class"),
+                                  (["stats", "--workers", "2", "--log", directory], "--log can't be used"),
+                                  (["tournament", "nosuch"], "modules nosuch: No module named"),
+                                  (["work", "--connect", "nowhere"], "expected an address like host:port")):
+                with contextlib.redirect_stderr(io.StringIO()) as errors, self.assertRaises(SystemExit) as exit:
+                    main(argv)
+                self.assertEqual(exit.exception.code, 2)
+                self.assertIn(message, errors.getvalue())
+
+    def test_tournament_without_goodies(self):
+        with contextlib.redirect_stderr(io.StringIO()) as errors:
+            self.assertEqual(main(["tournament", "baddies"]), 1)
+        self.assertIn("No goodies found", errors.getvalue())
+
+    def test_coordinate(self):
+        options = ["--games", "40", "--max-rounds", "200", "--goody", "goodies.TPWGoody"]
+        with contextlib.redirect_stderr(io.StringIO()):
+            distributed = self.run_json("coordinate", *options, "--listen", "localhost:0", "--workers", "3",
+                                        "--chunk-size", "7")
+        self.assertEqual(distributed, self.run_json("stats", *options))
+
+    def test_stats_heatmap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            serial_path, parallel_path = os.path.join(directory, "serial.npz"), os.path.join(directory, "parallel.npz")
+            serial = self.run_json("stats", "--games", "20", "--max-rounds", "200", "--heatmap", serial_path)
+            self.run_json("stats", "--games", "20", "--max-rounds", "200", "--heatmap", parallel_path, "--workers", "2")
+            serial_heatmap, parallel_heatmap = Heatmap.load(serial_path), Heatmap.load(parallel_path)
+        self.assertEqual(serial_heatmap.games, 20)
+        self.assertEqual(serial_heatmap.counts("baddy").sum(), serial["rounds"])
+        for layer in LAYERS:
+            self.assertTrue((serial_heatmap.counts(layer) == parallel_heatmap.counts(layer)).all())
+
+    def test_tournament(self):
+        cells = self.run_json("tournament", "--games", "5", "--max-rounds", "100", "--quiet")
+        self.assertEqual(len(cells), 9)
+        self.assertTrue(all(sum(cell["results"][result] for result in ("goodies win", "baddy wins", "draw")) == 5
+                            for cell in cells))
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
@@ -0,0 +1,171 @@
+'''
+    test_distributed.py
+
+    Unit tests for distributed.py
+'''
+
+import multiprocessing
+import time
+import unittest
+
+from multiprocessing.connection import Client
+
+from baddies import RandomBaddy
+from distributed import Coordinator, RequestError, STOP, work
+from example import EXAMPLE_MAZE
+from goodies import RandomGoody
+from maze import Baddy
+from tournament import run_games
+
+
+class BrokenBaddy(Baddy):
+    ''' A baddy that can't take a turn '''
+
+    def take_turn(self, obstruction, your_past_position):
+        raise ValueError("broken")
+
+
+class CoordinatorTest(unittest.TestCase):
+    ''' Test distributing games to worker processes on this machine '''
+
+    seeds = range(100, 300)
+    max_rounds = 300
+
+    def start_workers(self, coordinator, count):
+        workers = [multiprocessing.Process(target=work, args=(coordinator.address,), kwargs={"poll_interval": 0.05})
+                   for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    def stop_workers(self, coordinator, workers):
+        coordinator.close()
+        for worker in workers:
+            worker.join(10)
+            self.assertEqual(worker.exitcode, 0)
+
+    def expected(self):
+        return run_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, self.seeds, self.max_rounds)
+
+    def test_workers(self):
+        coordinator = Coordinator()
+        task_ids = coordinator.add_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, self.seeds,
+                                         self.max_rounds, chunk_size=15)
+        self.assertEqual(len(task_ids), 14)
+        workers = self.start_workers(coordinator, 3)
+        try:
+            self.assertEqual(coordinator.wait(timeout=60), self.expected())
+        finally:
+            self.stop_workers(coordinator, workers)
+        self.assertEqual(coordinator.duplicates, 0)
+
+    def test_dead_worker(self):
+        coordinator = Coordinator(lease_seconds=0.5)
+        coordinator.add_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, self.seeds, self.max_rounds,
+                              chunk_size=50)
+
+        # A worker that takes a task, then stops responding
+        with Client(coordinator.address, authkey=multiprocessing.current_process().authkey) as dead:
+            dead.send(("task", ()))
+            task_id, lease, task = dead.recv()
+            _maze_hash, _paths, _hashes, seeds, max_rounds = task
+
+            workers = self.start_workers(coordinator, 2)
+            try:
+                self.assertEqual(coordinator.wait(timeout=60), self.expected())
+
+                # If it comes back to life, its result isn't counted again
+                counts = run_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, range(*seeds), max_rounds)
+                dead.send(("complete", (task_id, lease, tuple(counts.values()))))
+                self.assertFalse(dead.recv())
+                self.assertEqual(coordinator.duplicates, 1)
+                self.assertEqual(coordinator.totals(), self.expected())
+            finally:
+                self.stop_workers(coordinator, workers)
+            dead.send(("task", ()))
+            self.assertEqual(dead.recv(), STOP)
+
+    def test_late_completion(self):
+        # A's lease on task 0 expires and B leases it again. A's late result counts, B's is a duplicate, and B's
+        # lease expiring afterwards isn't a failed attempt.
+        coordinator = Coordinator(lease_seconds=0.3, max_attempts=2)
+        coordinator.add_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, range(10), self.max_rounds,
+                              chunk_size=5)
+        authkey = multiprocessing.current_process().authkey
+
+        def play(client, task_id, lease, task):
+            _maze_hash, _paths, _hashes, seeds, max_rounds = task
+            counts = run_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, range(*seeds), max_rounds)
+            client.send(("complete", (task_id, lease, tuple(counts.values()))))
+            return client.recv()
+
+        with coordinator, Client(coordinator.address, authkey=authkey) as slow, \
+                Client(coordinator.address, authkey=authkey) as fast:
+            slow.send(("task", ()))
+            first = slow.recv()
+            self.assertEqual(first[0], 0)
+            time.sleep(0.4)
+            leased = {}
+            for _ in range(2):
+                fast.send(("task", ()))
+                task_id, lease, task = fast.recv()
+                leased[task_id] = (lease, task)
+            self.assertEqual(sorted(leased), [0, 1])
+            self.assertTrue(play(slow, *first))
+            self.assertFalse(play(fast, 0, *leased[0]))
+            self.assertTrue(play(fast, 1, *leased[1]))
+            time.sleep(0.4)
+            self.assertEqual(coordinator.wait(timeout=5),
+                             run_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, range(10), self.max_rounds))
+            self.assertEqual(coordinator.duplicates, 1)
+
+    def test_failing_task(self):
+        coordinator = Coordinator(max_attempts=2)
+        coordinator.add_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, BrokenBaddy, range(10), chunk_size=5)
+        workers = self.start_workers(coordinator, 2)
+        try:
+            with self.assertRaisesRegex(RuntimeError, "after 2 attempts: ValueError: broken"):
+                coordinator.wait(timeout=60)
+        finally:
+            self.stop_workers(coordinator, workers)
+
+    def test_bad_requests(self):
+        with Coordinator() as coordinator:
+            coordinator.add_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, range(10))
+            with Client(coordinator.address, authkey=multiprocessing.current_process().authkey) as client:
+                for request, message in ((("shuffle", ()), "Unknown request: 'shuffle'"),
+                                         (("maze", ("no such hash",)), "Unknown maze: no such hash"),
+                                         (("task", (1, 2)), "TypeError"),
+                                         ("nonsense", "ValueError")):
+                    client.send(request)
+                    reply = client.recv()
+                    self.assertIsInstance(reply, RequestError)
+                    self.assertIn(message, str(reply))
+                # The connection is still served
+                client.send(("task", ()))
+                self.assertEqual(client.recv()[0], 0)
+
+    def test_unknown_maze(self):
+        # The worker can't get the maze for its task, so the task fails rather than its lease being held
+        coordinator = Coordinator(max_attempts=2)
+        coordinator.add_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, range(10), chunk_size=5)
+        coordinator._mazes.clear()
+        workers = self.start_workers(coordinator, 1)
+        try:
+            with self.assertRaisesRegex(RuntimeError, "after 2 attempts: RequestError: ValueError: Unknown maze"):
+                coordinator.wait(timeout=60)
+        finally:
+            self.stop_workers(coordinator, workers)
+
+    def test_timeout(self):
+        with Coordinator() as coordinator:
+            self.assertEqual(coordinator.wait(timeout=0), coordinator.totals())  # Nothing to do
+            coordinator.add_games(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, range(10))
+            self.assertRaises(TimeoutError, coordinator.wait, timeout=0.1)
+        self.assertRaises(TypeError, coordinator.add_games, EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy,
+                          [1, 2, 3])
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
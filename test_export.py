@@ -0,0 +1,94 @@
+'''
+    test_export.py
+
+    Unit tests for export.py
+'''
+
+import os
+import tempfile
+import unittest
+
+try:
+    import PyQt5
+except ImportError:
+    PyQt5 = None
+
+if PyQt5 is not None:
+    from PyQt5.QtGui import QColor
+    from export import FrameRenderer, PALETTE, PLAYER_COLOURS, export_game, export_trace, record_trace
+
+from baddies import RandomBaddy
+from example import EXAMPLE_MAZE
+from goodies import RandomGoody
+from maze import Game, Maze, game_repeater
+
+
+@unittest.skipIf(PyQt5 is None, "PyQt5 is not installed")
+class ExportTest(unittest.TestCase):
+    ''' Test rendering games offscreen '''
+
+    def game(self, seed=1):
+        return next(game_repeater(EXAMPLE_MAZE, RandomGoody, RandomGoody, RandomBaddy, max_rounds=500, seeds=[seed]))
+
+    def test_record_trace(self):
+        game = self.game()
+        start = tuple((game.position[player].x, game.position[player].y) for player in game.players)
+        trace = record_trace(game)
+        self.assertEqual(len(trace), game.round + 1)
+        self.assertEqual(trace[0], start)
+        self.assertEqual(trace[-1], tuple((game.position[player].x, game.position[player].y)
+                                          for player in game.players))
+
+    def test_render(self):
+        renderer = FrameRenderer(EXAMPLE_MAZE, cell_size=4)
+        self.assertEqual((renderer.background.width(), renderer.background.height()),
+                         ((EXAMPLE_MAZE.width + 2) * 4, (EXAMPLE_MAZE.height + 2) * 4))
+        empty = next(x for x in range(EXAMPLE_MAZE.width) if EXAMPLE_MAZE[x, 0] == Maze.space)
+        frame = ((empty, 0), (1, 0), (2, EXAMPLE_MAZE.height - 1))
+        image = renderer.render(frame)
+        # The middle of each player's cell is its colour, and y = 0 is at the bottom
+        for (x, y), colour in zip(frame, PLAYER_COLOURS):
+            self.assertEqual(image.pixel((x + 1) * 4 + 2, (EXAMPLE_MAZE.height - y) * 4 + 2), colour)
+        self.assertEqual({image.pixel(x, y) for x in range(image.width()) for y in range(image.height())}
+                         - set(PALETTE), set())
+        # The background is left as it was, for the next frame
+        self.assertEqual(renderer.background.pixel((empty + 1) * 4 + 2, EXAMPLE_MAZE.height * 4 + 2), PALETTE[0])
+
+    def test_png_sequence(self):
+        game = self.game()
+        with tempfile.TemporaryDirectory() as directory:
+            result, frames = export_game(game, directory, cell_size=2, step=3)
+            self.assertEqual(frames, len(range(0, game.round, 3)) + 1)
+            self.assertEqual(sorted(os.listdir(directory))[0], "frame-000000.png")
+            self.assertEqual(len(os.listdir(directory)), frames)
+        self.assertNotEqual(result, Game.in_play)
+        self.assertRaises(ValueError, export_game, game, "unused")
+
+    def test_gif(self):
+        try:
+            from PIL import Image, ImageSequence
+        except ImportError:
+            self.skipTest("Pillow is not installed")
+        trace = record_trace(self.game(seed=3))[:20]
+        self.assertEqual(len(trace), 20)
+        trace.insert(10, trace[9])  # A frame that's the same as the one before
+        renderer = FrameRenderer(EXAMPLE_MAZE, cell_size=3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game.gif")
+            self.assertEqual(export_trace(EXAMPLE_MAZE, trace, path, cell_size=3), 21)
+            with Image.open(path) as gif:
+                self.assertEqual(gif.size, ((EXAMPLE_MAZE.width + 2) * 3, (EXAMPLE_MAZE.height + 2) * 3))
+                # Each frame only holds what changed, but they add up to what was rendered
+                for count, (frame, image) in enumerate(zip(ImageSequence.Iterator(gif), trace), 1):
+                    expected = renderer.render(image)
+                    rgb = frame.convert("RGB")
+                    self.assertEqual([rgb.getpixel((x, y)) for x in range(gif.width) for y in range(gif.height)],
+                                     [QColor(expected.pixel(x, y)).getRgb()[:3] for x in range(gif.width)
+                                      for y in range(gif.height)])
+                self.assertEqual(count, 21)
+            self.assertRaises(ValueError, export_trace, EXAMPLE_MAZE, [], path)
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
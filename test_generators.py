@@ -0,0 +1,36 @@
+'''
+    test_generators.py
+
+    Unit tests for generators.py
+'''
+
+import unittest
+
+from generators import perfect_maze, random_maze
+
+
+class GeneratorsTest(unittest.TestCase):
+    ''' Test the maze generators '''
+
+    def test_seeded(self):
+        self.assertEqual(perfect_maze(15, 11, seed=5).content_hash(), perfect_maze(15, 11, seed=5).content_hash())
+        self.assertEqual(random_maze(15, 11, seed=5).content_hash(), random_maze(15, 11, seed=5).content_hash())
+
+    def test_perfect_maze_is_connected(self):
+        maze = perfect_maze(21, 15, seed=2)
+        self.assertEqual(set(maze.derived().components), {-1, 0})
+        # A tree of corridors has one fewer connection than it has cells
+        data = maze.derived()
+        cells = [data.position(index) for index in data.empty_cells]
+        links = sum(1 for cell in cells for other in (cell + (1, 0), cell + (0, 1)) if not maze[other])
+        self.assertEqual(links, len(data.empty_cells) - 1)
+
+    def test_random_maze_density(self):
+        maze = random_maze(100, 100, density=0.3, seed=1)
+        self.assertAlmostEqual(1 - maze.empty_cells() / 10000, 0.3, delta=0.02)
+        self.assertEqual(random_maze(5, 5, density=0).empty_cells(), 25)
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
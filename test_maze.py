@@ -0,0 +1,218 @@
+'''
+    test_maze.py
+
+    Unit tests for maze.py
+'''
+
+import random
+import unittest
+
+from maze import (Maze, Game, Position, Obstruction, TabularPolicy, Goody, Baddy, game_repeater,
+                  UP, DOWN, LEFT, RIGHT, STAY, PING, STEP, MASK_BIT)
+from baddies import RandomBaddy
+from example import EXAMPLE_MAZE
+from goodies import RandomGoody, TPWGoody
+
+
+class PositionTest(unittest.TestCase):
+    ''' Test that the Position class is functioning as expected '''
+
+    def setUp(self):
+        ''' Define a couple of position objects to use in tests '''
+        self.pos1 = Position(5, 7)
+        self.pos2 = Position(-4, 9)
+
+    def test_addition(self):
+        self.assertEqual(self.pos1 + self.pos2, Position(1, 16))
+
+    def test_subtraction(self):
+        self.assertEqual(self.pos1 - self.pos2, Position(9, -2))
+
+    def test_negation(self):
+        self.assertEqual(-self.pos1, Position(-5, -7))
+
+    def test_equality(self):
+        self.assertTrue(self.pos1 == self.pos1)
+
+    def test_l1_norm(self):
+        self.assertTrue(self.pos1.l1_norm() == 12)
+        self.assertTrue(self.pos2.l1_norm() == 13)
+
+    def test_inequality(self):
+        self.assertTrue(self.pos1 != self.pos2)
+
+
+class MazeTextTest(unittest.TestCase):
+    ''' Test creating mazes from text '''
+
+    def test_digits(self):
+        maze = Maze.from_text("010\n"
+                              "001\n")
+        self.assertEqual(maze.content_hash(), Maze(3, 2, "010001").content_hash())
+
+    def test_round_trip(self):
+        maze = Maze(4, 3, "0010"
+                          "1000"
+                          "0110")
+        self.assertEqual(Maze.from_text(str(maze)).content_hash(), maze.content_hash())
+
+    def test_bad_text(self):
+        self.assertRaises(ValueError, Maze.from_text, "01\n0")
+        self.assertRaises(ValueError, Maze.from_text, "XXX\nX  \nXXX")
+        self.assertRaises(ValueError, Maze.from_text, "")
+
+class ObstructionTest(unittest.TestCase):
+    ''' Test obstruction masks and their Obstruction objects '''
+
+    def setUp(self):
+        self.maze = Maze(3, 2, "010"
+                               "000")
+
+    def test_mask_matches_obstruction(self):
+        for x in range(self.maze.width):
+            for y in range(self.maze.height):
+                mask = self.maze.obstruction_mask(Position(x, y))
+                obstruction = self.maze.obstruction(Position(x, y))
+                self.assertEqual(obstruction.mask, mask)
+                for direction, bit in MASK_BIT.items():
+                    self.assertEqual(obstruction[direction], bool(self.maze[Position(x, y) + STEP[direction]]))
+                    self.assertEqual(bool(mask & bit), obstruction[direction])
+
+    def test_corner(self):
+        self.assertEqual(self.maze.obstruction_mask(Position(0, 0)), MASK_BIT[DOWN] | MASK_BIT[LEFT])
+        self.assertEqual(self.maze.obstruction_mask(Position(0, 1)), MASK_BIT[UP] | MASK_BIT[LEFT] | MASK_BIT[RIGHT])
+
+
+class PolicyTableTest(unittest.TestCase):
+    ''' Test that PolicyTables and TabularPolicy players behave as declared '''
+
+    class WeightedBaddy(TabularPolicy, Baddy):
+        @classmethod
+        def move_distribution(cls, mask, pinged):
+            if pinged:
+                return {STAY: 1}
+            return {direction: weight for direction, weight in ((UP, 3), (DOWN, 1), (LEFT, 0), (RIGHT, 0))
+                    if not mask & MASK_BIT[direction]}
+
+    def test_distribution(self):
+        table = self.WeightedBaddy.policy_table()
+        self.assertEqual(table.distribution(0), {UP: 0.75, DOWN: 0.25})
+        self.assertEqual(table.distribution(MASK_BIT[UP]), {DOWN: 1.0})
+        self.assertEqual(table.distribution(0, pinged=True), {STAY: 1.0})
+
+    def test_boxed_in_stays(self):
+        table = self.WeightedBaddy.policy_table()
+        self.assertEqual(table.sample(MASK_BIT[UP] | MASK_BIT[DOWN]), STAY)
+
+    def test_table_is_cached(self):
+        self.assertIs(self.WeightedBaddy.policy_table(), self.WeightedBaddy.policy_table())
+
+    def test_sampling_frequencies(self):
+        random.seed(0)
+        table = self.WeightedBaddy.policy_table()
+        samples = [table.sample(0) for _ in range(4000)]
+        self.assertAlmostEqual(samples.count(UP) / len(samples), 0.75, delta=0.03)
+        self.assertEqual(set(samples), {UP, DOWN})
+
+    def test_take_turn_matches_game_sampling(self):
+        table = self.WeightedBaddy.policy_table()
+        baddy = self.WeightedBaddy()
+        random.seed(1)
+        from_take_turn = [baddy.take_turn(Obstruction.from_mask(0), None) for _ in range(100)]
+        random.seed(1)
+        from_table = [table.sample(0) for _ in range(100)]
+        self.assertEqual(from_take_turn, from_table)
+
+    def test_overridden_take_turn_is_called(self):
+        class StayingGoody(RandomGoody):
+            turns = 0
+
+            def take_turn(self, obstruction, ping_response):
+                StayingGoody.turns += 1
+                return STAY
+
+        game = Game(Maze(5, 5), StayingGoody(), StayingGoody(), self.WeightedBaddy(), max_rounds=21)
+        starts = [game.position[game.goody0], game.position[game.goody1]]
+        game.play()
+        self.assertGreater(StayingGoody.turns, 0)
+        self.assertEqual([game.position[game.goody0], game.position[game.goody1]], starts)
+        self.assertIsNone(game._tables[game.goody0])
+        self.assertIsNotNone(game._tables[game.baddy])
+
+    def test_bad_distribution(self):
+        class BadBaddy(TabularPolicy, Baddy):
+            @classmethod
+            def move_distribution(cls, mask, pinged):
+                return {"up": 1}
+        self.assertRaises(TypeError, BadBaddy.policy_table)
+
+class GameResetTest(unittest.TestCase):
+    ''' Test that recycled Games play out exactly like freshly constructed ones '''
+
+    class CountingGoody(Goody):
+        ''' Walks randomly, but pings every few turns - so its behaviour depends on its memory '''
+        def __init__(self):
+            self.turns = 0
+
+        def reset(self):
+            self.turns = 0
+
+        def take_turn(self, obstruction, _ping_response):
+            self.turns += 1
+            if self.turns % 7 == 0:
+                return PING
+            return random.choice([direction for direction in (UP, DOWN, LEFT, RIGHT) if not obstruction[direction]])
+
+    class WalkingBaddy(TabularPolicy, Baddy):
+        @classmethod
+        def move_distribution(cls, mask, _pinged):
+            return {direction: 1 for direction in (UP, DOWN, LEFT, RIGHT) if not mask & MASK_BIT[direction]}
+
+    def _play(self, recycle):
+        random.seed(1234)
+        maze = Maze(5, 4, "00000"
+                          "01010"
+                          "00000"
+                          "01100")
+        results = []
+        games = game_repeater(maze, self.CountingGoody, self.CountingGoody, self.WalkingBaddy, max_rounds=200,
+                              recycle=recycle)
+        for _, game in zip(range(50), games):
+            start = tuple(game.position[player] for player in game.players)
+            results.append((start,) + game.play())
+        return results
+
+    def test_recycled_matches_fresh(self):
+        self.assertEqual(self._play(recycle=False), self._play(recycle=True))
+
+    def test_seeded_games(self):
+        maze = Maze(6, 6)
+        play = lambda seeds, recycle: [game.play() + (game.position[game.goody0],) for game in
+                                       game_repeater(maze, self.CountingGoody, self.CountingGoody, self.WalkingBaddy,
+                                                     max_rounds=100, recycle=recycle, seeds=seeds)]
+        all_games = play(range(10), recycle=True)
+        self.assertEqual(len(all_games), 10)
+        self.assertEqual(all_games, play(range(10), recycle=False))
+        self.assertEqual(all_games[5:], play(range(5, 10), recycle=True))
+
+    def test_tpw_goody(self):
+        # TPWGoody remembers walls and its position, so this only passes if its reset() forgets them
+        play = lambda recycle: [game.play() + (game.position[game.goody0], len(game.goody0.known_walls)) for game in
+                                game_repeater(EXAMPLE_MAZE, TPWGoody, TPWGoody, RandomBaddy, max_rounds=500,
+                                              recycle=recycle, seeds=range(30))]
+        recycled = play(recycle=True)
+        self.assertEqual(recycled, play(recycle=False))
+        self.assertGreater(len(set(recycled)), 1)
+
+    def test_reset_state(self):
+        game = Game(Maze(4, 4), self.CountingGoody(), self.CountingGoody(), self.WalkingBaddy(), max_rounds=5)
+        game.play()
+        game.reset()
+        self.assertEqual((game.round, game.ping, game.status), (0, False, Game.not_started))
+        self.assertEqual(game.goody0.turns, 0)
+        self.assertEqual(len(set(game.position.values())), 3)
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
@@ -0,0 +1,112 @@
+'''
+    test_planner.py
+
+    Unit tests for planner.py
+'''
+
+import random
+import unittest
+
+from collections import deque
+
+from planner import DStarLite, HEURISTIC_WEIGHT
+
+
+class DStarLiteTest(unittest.TestCase):
+    ''' Test that incremental planning finds (near) shortest paths as walls are discovered '''
+
+    size = 30
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.walls = {(x, y) for x in range(self.size) for y in range(self.size) if rng.random() < 0.25}
+        self.walls -= {(0, 0), (self.size - 1, self.size - 1)}
+
+    def blocked(self, cell):
+        return cell in self.walls or not (0 <= cell[0] < self.size and 0 <= cell[1] < self.size)
+
+    def bfs_distance(self, start, goal):
+        distances = {start: 0}
+        queue = deque([start])
+        while queue:
+            x, y = cell = queue.popleft()
+            for neighbour in ((x, y + 1), (x - 1, y), (x, y - 1), (x + 1, y)):
+                if neighbour not in distances and not self.blocked(neighbour):
+                    distances[neighbour] = distances[cell] + 1
+                    queue.append(neighbour)
+        return distances.get(goal, float("inf"))
+
+    def walk(self, planner):
+        ''' Follow the planner's path to the goal, returning the number of steps '''
+        steps = 0
+        while planner.start != planner.goal:
+            self.assertTrue(planner.compute())
+            step = planner.next_step()
+            self.assertIsNotNone(step)
+            planner.move_start(step)
+            steps += 1
+        return steps
+
+    def test_shortest_path(self):
+        goal = (self.size - 1, self.size - 1)
+        planner = DStarLite((0, 0), goal, self.blocked)
+        self.assertTrue(planner.compute())
+        shortest = self.bfs_distance((0, 0), goal)
+        self.assertLessEqual(planner.cost((0, 0)), shortest * HEURISTIC_WEIGHT)
+        self.assertLessEqual(self.walk(planner), shortest * HEURISTIC_WEIGHT)
+
+    def test_walls_discovered_on_the_way(self):
+        goal = (self.size - 1, self.size - 1)
+        hidden, self.walls = self.walls, set()
+        planner = DStarLite((0, 0), goal, self.blocked)
+        steps = 0
+        while planner.start != goal:
+            # Reveal the walls next to us, as a player would see them
+            x, y = planner.start
+            seen = [cell for cell in ((x, y + 1), (x - 1, y), (x, y - 1), (x + 1, y))
+                    if cell in hidden and cell not in self.walls]
+            self.walls.update(seen)
+            planner.blocked_changed(seen)
+            self.assertTrue(planner.compute())
+            planner.move_start(planner.next_step())
+            steps += 1
+            self.assertLess(steps, self.size ** 2)
+        # Now the walls we saw are known, a fresh planner must agree with the incremental one about the cost
+        fresh = DStarLite((0, 0), goal, self.blocked)
+        fresh.compute()
+        self.assertLessEqual(fresh.cost((0, 0)), steps)
+
+    def test_unreachable(self):
+        self.walls |= {(1, 0), (0, 1)}
+        planner = DStarLite((0, 0), (5, 5), self.blocked)
+        self.assertTrue(planner.compute())
+        self.assertEqual(planner.cost((0, 0)), float("inf"))
+
+    def test_expansion_limit(self):
+        planner = DStarLite((0, 0), (self.size - 1, self.size - 1), self.blocked)
+        self.assertFalse(planner.compute(max_expansions=5))
+        self.assertEqual(planner.expansions, 5)
+        self.assertTrue(planner.compute())  # Carries on where it left off
+        fresh = DStarLite((0, 0), planner.goal, self.blocked)
+        fresh.compute()
+        self.assertEqual(planner.cost((0, 0)), fresh.cost((0, 0)))
+
+    def test_affected(self):
+        goal = (self.size - 1, self.size - 1)
+        planner = DStarLite((0, 0), goal, self.blocked)
+        planner.compute(max_expansions=50)
+        # Open up walls all over the grid - only those next to the search so far need passing on
+        opened = sorted(self.walls)[::2]
+        self.walls.difference_update(opened)
+        affected = planner.affected(opened)
+        self.assertTrue(0 < len(affected) < len(opened))
+        planner.blocked_changed(affected)
+        self.assertEqual(planner.updates, len(affected))
+        self.assertTrue(planner.compute())
+        self.assertLessEqual(planner.cost((0, 0)), self.bfs_distance((0, 0), goal) * HEURISTIC_WEIGHT)
+        self.assertLessEqual(self.walk(planner), self.bfs_distance((0, 0), goal) * HEURISTIC_WEIGHT)
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+'''
+    test_resultlog.py
+
+    Unit tests for resultlog.py
+'''
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from maze import Maze, Game
+from resultlog import RESULT_CODES, RESULT_NAMES, ResultLog, load, strings, _complete_chunks
+
+
+class ResultLogTest(unittest.TestCase):
+    ''' Test writing and reading back a log '''
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        self.maze = Maze(3, 3)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_round_trip(self):
+        with ResultLog(self.directory, chunk_size=4) as log:
+            for seed in range(10):
+                log.append(seed, self.maze, "goodies.RandomGoody", "goodies.TPWGoody", "baddies.RandomBaddy",
+                           RESULT_NAMES[seed % 3], seed * 10, seconds=0.5 if seed % 2 else None)
+            self.assertEqual(len(log), 2)  # Two full chunks have been written already
+        self.assertEqual(len(_complete_chunks(self.directory)), 3)
+
+        data = load(self.directory)
+        np.testing.assert_array_equal(data["seed"], np.arange(10))
+        np.testing.assert_array_equal(data["rounds"], np.arange(10) * 10)
+        np.testing.assert_array_equal(data["result"], np.arange(10) % 3)
+        self.assertEqual(np.isnan(data["seconds"]).sum(), 5)
+        names = strings(self.directory)
+        self.assertEqual(names[data["maze"][0]], self.maze.content_hash())
+        self.assertEqual(names[data["goody1"][3]], "goodies.TPWGoody")
+
+    def test_selected_columns(self):
+        with ResultLog(self.directory) as log:
+            log.append(7, "maze-a", "g", "g", "b", Game.draw, 100)
+        data = load(self.directory, columns=["rounds"])
+        self.assertEqual(list(data), ["rounds"])
+        self.assertIsInstance(data["rounds"], np.memmap)
+        self.assertRaises(ValueError, load, self.directory, ["no such column"])
+
+    def test_append_to_existing(self):
+        with ResultLog(self.directory) as log:
+            log.append(1, "maze-a", "g", "g", "b", Game.draw, 1)
+        with ResultLog(self.directory) as log:
+            log.append(2, "maze-b", "g", "g", "b2", Game.goodies_win, 2)
+        data = load(self.directory)
+        np.testing.assert_array_equal(data["seed"], [1, 2])
+        self.assertEqual([strings(self.directory)[code] for code in data["baddy"]], ["b", "b2"])
+
+    def test_empty(self):
+        self.assertEqual(len(load(self.directory)["seed"]), 0)
+        ResultLog(self.directory).close()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_record_game(self):
+        from tournament import run_matchup
+        from goodies import RandomGoody
+        from baddies import RandomBaddy
+        with ResultLog(self.directory) as log:
+            counts = run_matchup(self.maze, RandomGoody, RandomBaddy, range(20), max_rounds=50, log=log)
+        data = load(self.directory)
+        np.testing.assert_array_equal(data["seed"], np.arange(20))
+        self.assertEqual(data["rounds"].sum(), counts["rounds"])
+        self.assertEqual((data["result"] == RESULT_CODES[Game.goodies_win]).sum(), counts[Game.goodies_win])
+        self.assertFalse(np.isnan(data["seconds"]).any())
+        self.assertEqual(strings(self.directory)[data["goody0"][0]], "goodies.RandomGoody")
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+'''
+    test_sparse.py
+
+    Unit tests for sparse.py
+'''
+
+import pickle
+import unittest
+
+from generators import random_maze
+from maze import Maze, Position, game_repeater
+from goodies import TPWGoody
+from baddies import RandomBaddy
+from sparse import SparseMaze
+
+
+class SparseMazeTest(unittest.TestCase):
+    ''' Test that a SparseMaze behaves just like an equal Maze '''
+
+    def setUp(self):
+        self.dense = random_maze(37, 23, density=0.2, seed=7)
+        self.sparse = SparseMaze.from_maze(self.dense, chunk_size=8)
+
+    def assert_same(self, dense, sparse):
+        self.assertEqual((sparse.width, sparse.height), (dense.width, dense.height))
+        for x in range(-1, dense.width + 1):
+            for y in range(-1, dense.height + 1):
+                self.assertEqual(sparse[x, y], dense[x, y])
+                self.assertEqual(sparse.obstruction_mask(Position(x, y)), dense.obstruction(Position(x, y)).mask)
+        self.assertEqual(sparse.empty_cells(), dense.empty_cells())
+        self.assertEqual(str(sparse), str(dense))
+
+    def test_same_as_dense(self):
+        self.assert_same(self.dense, self.sparse)
+        self.assert_same(self.dense, SparseMaze(37, 23, repr(self.sparse).split(", ")[2], chunk_size=8))
+        self.assert_same(self.dense, SparseMaze.from_text(str(self.dense)))
+
+    def test_setitem(self):
+        maze = SparseMaze(100, 100, chunk_size=16)
+        self.assertEqual(maze.chunk_count(), 0)
+        before = maze.content_hash()
+        maze[50, 50] = Maze.wall
+        maze[51, 50] = Maze.wall
+        self.assertEqual(maze.chunk_count(), 1)
+        self.assertEqual(maze.empty_cells(), 9998)
+        self.assertNotEqual(maze.content_hash(), before)
+        maze[50, 50] = Maze.space
+        maze[Position(51, 50)] = Maze.space
+        self.assertEqual(maze.chunk_count(), 0)
+        self.assertEqual(maze.content_hash(), before)
+        self.assertRaises(IndexError, maze.__setitem__, (100, 0), Maze.wall)
+        self.assertRaises(ValueError, maze.__setitem__, (0, 0), 2)
+
+    def test_tile_and_pickle(self):
+        self.assert_same(self.dense * (2, 3), self.sparse * (2, 3))
+        self.assert_same(self.dense, pickle.loads(pickle.dumps(self.sparse)))
+
+    def test_large(self):
+        maze = SparseMaze(10000, 10000)
+        for i in range(0, 10000, 10):
+            maze[i, i] = Maze.wall
+        self.assertEqual(maze.empty_cells(), 10000 * 10000 - 1000)
+        self.assertLessEqual(maze.chunk_count(), 157)
+        self.assertEqual(maze.obstruction_mask(Position(11, 10)), 2)
+
+    def test_derived(self):
+        self.assertEqual(self.sparse.derived().cells, self.dense.derived().cells)
+        self.assertRaises(ValueError, SparseMaze(10000, 10000).derived)
+
+    def test_games_match_dense(self):
+        def play(maze):
+            games = game_repeater(maze, TPWGoody, TPWGoody, RandomBaddy, max_rounds=150, recycle=True,
+                                  seeds=range(20))
+            return [game.play() + (game.position[game.baddy],) for game in games]
+        self.assertEqual(play(self.dense), play(self.sparse))
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
@@ -0,0 +1,182 @@
+'''
+    test_tournament.py
+
+    Unit tests for tournament.py
+'''
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+import tournament
+
+from baddies import PursuitBaddy, RandomBaddy
+from goodies import RandomGoody, TPWGoody
+from maze import Maze, Goody, STAY, UP, DOWN, LEFT, RIGHT, game_repeater
+from tournament import (RESULTS, ResultStore, code_hash, discover_players, format_matrix, matchup_matrix, resolve,
+                        run_matchup)
+
+
+class TiringGoody(Goody):
+    ''' Walks randomly for 20 turns, then stays put. It doesn't forget its turns in reset(), so can't be recycled. '''
+
+    def __init__(self):
+        self.turns = 0
+
+    def take_turn(self, obstruction, _ping_response):
+        self.turns += 1
+        options = [direction for direction in (UP, DOWN, LEFT, RIGHT) if not obstruction[direction]]
+        return random.choice(options) if self.turns <= 20 and options else STAY
+
+
+class TournamentTest(unittest.TestCase):
+    ''' Test player discovery, and that stored results are reused only when their inputs match '''
+
+    maze = Maze(6, 5, "000000"
+                      "010010"
+                      "000000"
+                      "010010"
+                      "000000")
+
+    def test_discover(self):
+        goodies, baddies = discover_players(["goodies", "baddies"])
+        self.assertEqual([cls.__name__ for cls in goodies], ["RandomGoody", "StaticGoody", "TPWGoody"])
+        self.assertEqual([cls.__name__ for cls in baddies], ["PursuitBaddy", "RandomBaddy", "StaticBaddy"])
+
+    def test_resolve(self):
+        self.assertIs(resolve("maze.Maze"), Maze)
+        self.assertIs(resolve("test_tournament.TournamentTest.maze"), self.maze)
+        self.assertRaises(ValueError, resolve, "maze.NoSuchThing")
+
+    def test_code_hash(self):
+        goodies, baddies = discover_players(["goodies", "baddies"])
+        hashes = {code_hash(cls) for cls in goodies + baddies}
+        self.assertEqual(len(hashes), len(goodies) + len(baddies))
+        self.assertEqual(code_hash(goodies[0]), code_hash(goodies[0]))
+
+    def write_players(self, directory, sources):
+        ''' Write modules (a dict of name to source) to 'directory', as local modules for code_hash '''
+        for name, source in sources.items():
+            with open(os.path.join(directory, name + ".py"), "w") as stream:
+                stream.write(source)
+        tournament._local_imports.cache_clear()
+
+    def with_players(self, test, *module_names):
+        ''' Call test(directory) with 'directory' importable, and treated as where our local modules are '''
+        with tempfile.TemporaryDirectory() as directory:
+            sys.path.insert(0, directory)
+            original_root = tournament._ROOT
+            tournament._ROOT = os.path.realpath(directory)
+            try:
+                test(directory)
+            finally:
+                tournament._ROOT = original_root
+                tournament._local_imports.cache_clear()
+                sys.path.remove(directory)
+                for name in module_names:
+                    sys.modules.pop(name, None)
+
+    def test_code_hash_covers_helpers(self):
+        players = ("from maze import Baddy\nfrom hash_test_helper import STEPS\n\n"
+                   "class HelpedBaddy(Baddy):\n    steps = STEPS\n\n"
+                   "class UnhelpedBaddy(Baddy):\n    pass\n")
+
+        def test(directory):
+            self.write_players(directory, {"hash_test_helper": "STEPS = 1\n", "hash_test_players": players})
+            helped, unhelped = resolve("hash_test_players.HelpedBaddy"), resolve("hash_test_players.UnhelpedBaddy")
+            before = code_hash(helped), code_hash(unhelped)
+            self.write_players(directory, {"hash_test_helper": "STEPS = 2\n"})
+            self.assertNotEqual(code_hash(helped), before[0])
+            self.assertEqual(code_hash(unhelped), before[1])  # It doesn't use the helper
+
+        self.with_players(test, "hash_test_players", "hash_test_helper")
+
+    def test_edit_one_player(self):
+        # Two goodies share a module, and use a function from it. Editing one replays only its cells; editing the
+        # function they share replays both.
+        players = ("import random\nfrom maze import Goody, STAY, UP, DOWN, LEFT, RIGHT\n\n"
+                   "def choose(options):\n    return random.choice(options)\n\n"
+                   "class FirstGoody(Goody):\n    def take_turn(self, _obstruction, _ping):\n"
+                   "        return choose([UP, DOWN, LEFT, RIGHT])\n\n"
+                   "class SecondGoody(Goody):\n    def take_turn(self, _obstruction, _ping):\n"
+                   "        return choose([UP, LEFT, STAY])\n")
+        computed = []
+        progress = lambda maze, goody, baddy, counts, cached: None if cached else computed.append(goody.__name__)
+
+        def test(directory):
+            self.write_players(directory, {"edit_test_players": players})
+            goodies = discover_players(["edit_test_players"])[0]
+            store = ResultStore()
+            run = lambda: matchup_matrix([self.maze], goodies, [RandomBaddy, PursuitBaddy], range(3), max_rounds=20,
+                                         store=store, progress=progress)
+            both = ["FirstGoody"] * 2 + ["SecondGoody"] * 2
+            run()
+            self.assertEqual(sorted(computed), both)
+
+            # Each edit is made to the original source, whose results are all in the store
+            for old, new, expected in (("[UP, LEFT, STAY]", "[STAY, UP]", ["SecondGoody"] * 2),
+                                       ("random.choice(options)", "options[0]", both),
+                                       ("import random", "# Comments don't count\nimport random", [])):
+                del computed[:]
+                self.write_players(directory, {"edit_test_players": players.replace(old, new)})
+                run()
+                self.assertEqual(sorted(computed), expected)
+
+        self.with_players(test, "edit_test_players")
+
+    def test_code_hash_sources(self):
+        closure = tournament._source_closure([tournament._local_module_path("baddies")])
+        # The planner PursuitBaddy uses, and the engine, but not the command line maze.py runs as a script
+        self.assertEqual(sorted(os.path.basename(path) for path in closure),
+                         ["baddies.py", "cache.py", "maze.py", "planner.py"])
+
+    def test_empty_matrix(self):
+        self.assertEqual(format_matrix(matchup_matrix([self.maze], [], [], range(1))), "No matchups to show")
+
+    def test_incremental(self):
+        goodies, baddies = discover_players(["goodies", "baddies"])
+        computed = []
+        progress = lambda maze, goody, baddy, counts, cached: computed.append(not cached)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            first = matchup_matrix([self.maze], goodies, baddies[:1], range(5), max_rounds=50,
+                                   store=ResultStore(path), progress=progress)
+            self.assertEqual(computed, [True] * 3)
+
+            # Adding a baddy only plays the new column - and the stored results survive reloading
+            del computed[:]
+            second = matchup_matrix([self.maze], goodies, baddies, range(5), max_rounds=50,
+                                    store=ResultStore(path), progress=progress)
+            self.assertEqual(sorted(computed), [False] * 3 + [True] * 6)
+            for cell, counts in first.items():
+                self.assertEqual(second[cell], counts)
+
+            # A different seed range is a different cell
+            del computed[:]
+            matchup_matrix([self.maze], goodies[:1], baddies[:1], range(1, 6), max_rounds=50,
+                           store=ResultStore(path), progress=progress)
+            self.assertEqual(computed, [True])
+
+    def test_players_that_dont_reset(self):
+        self.assertEqual([cls.can_recycle() for cls in (RandomGoody, TPWGoody, PursuitBaddy, TiringGoody)],
+                         [True, True, True, False])
+        fresh = dict.fromkeys(RESULTS, 0)
+        fresh["rounds"] = 0
+        for game in game_repeater(self.maze, TiringGoody, TiringGoody, RandomBaddy, max_rounds=100, seeds=range(50)):
+            result, rounds = game.play()
+            fresh[result] += 1
+            fresh["rounds"] += rounds
+        self.assertEqual(run_matchup(self.maze, TiringGoody, RandomBaddy, range(50), max_rounds=100), fresh)
+
+    def test_deterministic(self):
+        goodies, baddies = discover_players(["goodies", "baddies"])
+        counts = run_matchup(self.maze, goodies[0], baddies[0], range(20), max_rounds=100)
+        self.assertEqual(counts, run_matchup(self.maze, goodies[0], baddies[0], range(20), max_rounds=100))
+        self.assertEqual(sum(counts[result] for result in RESULTS), 20)
+
+
+if __name__ == "__main__":
+    # Run the unittests in this script, with a nice level of output
+    unittest.main(verbosity=2)
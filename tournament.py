@@ -0,0 +1,402 @@
+'''
+    tournament.py
+
+    Round-robin matchups between every Goody and every Baddy, over a corpus of mazes.
+
+    Each cell of the matchup matrix - a pair of identical goodies against a baddy, on one maze, over a range of
+    seeds - is stored in a ResultStore under a key made from:
+        the maze's content hash
+        each player's class path and code hash (a hash of the source it depends on - see code_hash)
+        the seed range and the maximum number of rounds
+    so re-running after changing one player only recomputes the cells that player takes part in.
+
+        discover_players - find the Goody and Baddy classes defined in some modules
+        code_hash - a hash of the source code a player class depends on
+        run_matchup - play a range of seeded games and count the results
+        ResultStore - a JSON file of results, keyed as above
+        matchup_matrix - run (or look up) every cell, and total the results over the mazes
+
+    Run "python -m maze tournament" to print a matchup matrix, e.g.
+        python -m maze tournament --maze example.EXAMPLE_MAZE --games 500 --store results.json goodies baddies
+'''
+
+import ast
+import functools
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+
+from collections import OrderedDict
+
+from maze import Maze, Game, Goody, Baddy, Player, game_repeater
+
+
+RESULTS = (Game.goodies_win, Game.baddy_wins, Game.draw)
+
+
+def resolve(path):
+    ''' Return the object named by a dotted path, e.g. "goodies.RandomGoody", importing modules as needed '''
+    module_name, _, attribute = path.rpartition(".")
+    if not module_name:
+        raise ValueError("Expected a dotted path like 'module.name', got: {}".format(path))
+    try:
+        module = importlib.import_module(module_name)
+    except ModuleNotFoundError as error:
+        if error.name != module_name or "." not in module_name:
+            raise
+        # Perhaps the last part of the module name is itself an attribute (e.g. a nested class)
+        return getattr(resolve(module_name), attribute)
+    try:
+        return getattr(module, attribute)
+    except AttributeError:
+        raise ValueError("{} has no attribute {!r}".format(module_name, attribute)) from None
+
+
+def class_path(cls):
+    ''' Return the dotted path of a class, as accepted by resolve() '''
+    return "{}.{}".format(cls.__module__, cls.__qualname__)
+
+
+def discover_players(modules):
+    ''' Find the concrete Goody and Baddy classes defined in the given modules (module objects or names).
+        Returns two lists - goodies and baddies - each sorted by class path.
+    '''
+    goodies, baddies = set(), set()
+    for module in modules:
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        for value in vars(module).values():
+            if (not inspect.isclass(value) or value.__module__ != module.__name__ or inspect.isabstract(value)):
+                continue
+            if issubclass(value, Goody):
+                goodies.add(value)
+            elif issubclass(value, Baddy):
+                baddies.add(value)
+    return sorted(goodies, key=class_path), sorted(baddies, key=class_path)
+
+
+_ROOT = os.path.dirname(os.path.realpath(__file__))
+
+
+def _local_module_path(name):
+    ''' Return the source file of the module called 'name', if it's one of ours (in this directory), or None '''
+    module = sys.modules.get(name)
+    path = getattr(module, "__file__", None)
+    if path is None:
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            return None
+        path = spec.origin if spec is not None else None
+    if path is None or not path.endswith(".py") or os.path.dirname(os.path.realpath(path)) != _ROOT:
+        return None
+    return os.path.realpath(path)
+
+
+def _is_main_check(test):
+    ''' Return True if 'test' is the expression: __name__ == "__main__" '''
+    return (isinstance(test, ast.Compare) and isinstance(test.left, ast.Name) and test.left.id == "__name__" and
+            len(test.comparators) == 1 and isinstance(test.comparators[0], ast.Constant) and
+            test.comparators[0].value == "__main__")
+
+
+@functools.lru_cache(maxsize=None)
+def _local_imports(path):
+    ''' Return the source files of the local modules imported (anywhere) by the source file at 'path' '''
+    with open(path, "rb") as stream:
+        tree = ast.parse(stream.read(), path)
+    names = set()
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names.add(node.module)
+        elif isinstance(node, ast.If) and _is_main_check(node.test):
+            nodes.extend(node.orelse)  # What's run as a script isn't part of what players depend on
+            continue
+        nodes.extend(ast.iter_child_nodes(node))
+    return frozenset(filter(None, map(_local_module_path, names)))
+
+
+def _source_closure(paths):
+    ''' Return the given source files and all the local modules they import, directly or indirectly '''
+    closure, pending = set(), list(paths)
+    while pending:
+        path = pending.pop()
+        if path not in closure:
+            closure.add(path)
+            pending.extend(_local_imports(path))
+    return closure
+
+
+def _statements(body):
+    ''' Yield the statements in a module's 'body', including those in if and try blocks, but not the __main__ block '''
+    for node in body:
+        if isinstance(node, ast.If):
+            if not _is_main_check(node.test):
+                yield from _statements(node.body)
+            yield from _statements(node.orelse)
+        elif isinstance(node, ast.Try):
+            for block in [node.body, node.orelse, node.finalbody] + [handler.body for handler in node.handlers]:
+                yield from _statements(block)
+        else:
+            yield node
+
+
+def _imported_modules(node):
+    ''' Return a dict mapping the names an import statement binds to the modules they come from '''
+    if isinstance(node, ast.Import):
+        return {(alias.asname or alias.name).partition(".")[0]: alias.name for alias in node.names}
+    if isinstance(node, ast.ImportFrom) and node.level == 0:
+        return {alias.asname or alias.name: node.module for alias in node.names}
+    return {}
+
+
+@functools.lru_cache(maxsize=None)
+def _module_index(source):
+    ''' Parse a module's source. Returns the tree, a dict mapping each name defined at module level to the statements
+        that assign it, and a dict mapping each name imported at module level to the modules it comes from.
+    '''
+    tree = ast.parse(source)
+    definitions, imports = {}, {}
+    for node in _statements(tree.body):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for name, module in _imported_modules(node).items():
+                imports.setdefault(name, set()).add(module)
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names = [node.name]
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [name.id for target in targets for name in ast.walk(target) if isinstance(name, ast.Name)]
+        else:
+            continue
+        for name in names:
+            definitions.setdefault(name, []).append(node)
+    return tree, definitions, imports
+
+
+def _find_definition(tree, qualname):
+    ''' Return the class or function statement for a __qualname__ in a module's tree, or None '''
+    node, body = None, list(_statements(tree.body))
+    for name in qualname.split("."):
+        matches = [child for child in body if isinstance(child, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))
+                   and child.name == name]
+        if not matches:
+            return None  # E.g. a class defined in a function
+        node = matches[-1]
+        body = node.body
+    return node
+
+
+def _dependencies(source, node):
+    ''' Return the dumped ASTs of 'node' and of the module-level definitions it refers to, directly or indirectly,
+        and the names of the modules they import names from
+    '''
+    _tree, definitions, imports = _module_index(source)
+    dumps, modules, seen = [], set(), set()
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        dumps.append(ast.dump(current))
+        for child in ast.walk(current):
+            if isinstance(child, (ast.Import, ast.ImportFrom)):
+                modules.update(_imported_modules(child).values())
+            elif isinstance(child, ast.Name) and child.id not in seen:
+                seen.add(child.id)
+                pending.extend(definitions.get(child.id, ()))
+                modules.update(imports.get(child.id, ()))
+    return sorted(set(dumps)), modules
+
+
+def code_hash(cls):
+    ''' Return a hex digest of the code a player class runs: its own source, the module-level functions, classes and
+        variables that refers to (and so on), the local modules they use names from (and the local modules those
+        import), and maze.py - so that changing a helper, or the engine, changes the hash, but changing another
+        player in the same module doesn't. Falls back to the source of the class itself, and the whole of its module,
+        if it can't be found in the module's source.
+    '''
+    digest = hashlib.sha1(class_path(cls).encode("utf-8"))
+    module_path = _local_module_path(cls.__module__)
+    node = None
+    if module_path is not None:
+        with open(module_path, "rb") as stream:
+            source = stream.read()
+        node = _find_definition(_module_index(source)[0], cls.__qualname__)
+    if node is not None:
+        dumps, modules = _dependencies(source, node)
+        for dump in dumps:
+            digest.update(dump.encode("utf-8"))
+        roots = [_local_module_path(module) for module in sorted(modules)]
+    else:
+        try:
+            digest.update(inspect.getsource(cls).encode("utf-8"))
+        except (OSError, TypeError):
+            pass  # No source available (e.g. defined interactively) - fall back to the class path alone
+        roots = [module_path]
+    roots.append(_local_module_path(Player.__module__))
+    for path in sorted(_source_closure(filter(None, roots))):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as stream:
+            digest.update(stream.read())
+    return digest.hexdigest()[:16]
+
+
+def run_games(maze, goody0_cls, goody1_cls, baddy_cls, seeds, max_rounds=10000, log=None, hook=None):
+    ''' Play one seeded game per seed - in a recycled Game (see game_repeater) if every player can be recycled
+        (see Player.can_recycle), otherwise in new ones.
+        Returns a dict with a count for each result, and the total number of rounds played.
+        If 'log' (a resultlog.ResultLog) is given, each game is timed and recorded in it.
+        'hook' is passed to Game.play, e.g. an analytics.Heatmap.
+    '''
+    counts = dict.fromkeys(RESULTS, 0)
+    counts["rounds"] = 0
+    seeds = list(seeds)
+    recycle = all(cls.can_recycle() for cls in (goody0_cls, goody1_cls, baddy_cls))
+    games = game_repeater(maze, goody0_cls, goody1_cls, baddy_cls, max_rounds=max_rounds, recycle=recycle,
+                          seeds=seeds)
+    for seed, game in zip(seeds, games):
+        start = time.perf_counter()
+        result, rounds = game.play(hook=hook)
+        if log is not None:
+            log.record(seed, game, result, rounds, time.perf_counter() - start)
+        counts[result] += 1
+        counts["rounds"] += rounds
+    return counts
+
+
+def run_matchup(maze, goody_cls, baddy_cls, seeds, max_rounds=10000, log=None):
+    ''' Like run_games, with two 'goody_cls' goodies against a 'baddy_cls' baddy '''
+    return run_games(maze, goody_cls, goody_cls, baddy_cls, seeds, max_rounds=max_rounds, log=log)
+
+
+def _run_matchup_task(args):
+    ''' Unpack the arguments to run_matchup - for use with Pool.imap '''
+    return run_matchup(*args)
+
+
+class ResultStore(object):
+    ''' Matchup results, persisted as a JSON file.
+        Each put() rewrites the file (atomically), so an interrupted run keeps everything finished so far.
+    '''
+
+    def __init__(self, path=None):
+        self.path = path
+        self._results = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as stream:
+                self._results = json.load(stream)
+
+    @staticmethod
+    def key(maze, goody_cls, baddy_cls, seeds, max_rounds):
+        ''' Return the key that identifies a cell's inputs. 'seeds' must be a range. '''
+        return "|".join([maze.content_hash(),
+                         "{}@{}".format(class_path(goody_cls), code_hash(goody_cls)),
+                         "{}@{}".format(class_path(baddy_cls), code_hash(baddy_cls)),
+                         "{}:{}:{}".format(seeds.start, seeds.stop, seeds.step),
+                         str(max_rounds)])
+
+    def __len__(self):
+        return len(self._results)
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def get(self, key):
+        return self._results.get(key)
+
+    def put(self, key, counts):
+        self._results[key] = counts
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as stream:
+                json.dump(self._results, stream, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def matchup_matrix(mazes, goodies, baddies, seeds, max_rounds=10000, store=None, progress=None, log=None,
+                   pool=None):
+    ''' Play every goody class against every baddy class, on every maze, over the given range of seeds.
+        Cells already in 'store' (a ResultStore) are not replayed. Games that are played are recorded in 'log',
+        if given (see run_matchup).
+        If 'pool' (a multiprocessing Pool) is given, cells are played in its worker processes. It can't be used with
+        'log', which only records games played in this process.
+        'progress', if given, is called with (maze, goody_cls, baddy_cls, counts, cached) after each cell.
+        Returns an OrderedDict mapping (goody_cls, baddy_cls) to result counts totalled over the mazes.
+    '''
+    if not isinstance(seeds, range):
+        raise TypeError("'seeds' must be a range, got: {}".format(seeds))
+    for maze in mazes:
+        if not isinstance(maze, Maze):
+            raise TypeError("'mazes' must contain Maze objects, got: {}".format(maze))
+    if pool is not None and log is not None:
+        raise ValueError("A results log can't be used with a pool of worker processes")
+    store = ResultStore() if store is None else store
+
+    cells = [(goody_cls, baddy_cls, maze) for goody_cls in goodies for baddy_cls in baddies for maze in mazes]
+    keys = [store.key(maze, goody_cls, baddy_cls, seeds, max_rounds) for goody_cls, baddy_cls, maze in cells]
+    cell_counts = [store.get(key) for key in keys]
+    if progress is not None:
+        for (goody_cls, baddy_cls, maze), counts in zip(cells, cell_counts):
+            if counts is not None:
+                progress(maze, goody_cls, baddy_cls, counts, True)
+
+    # Play the cells that weren't in the store
+    pending = [index for index, counts in enumerate(cell_counts) if counts is None]
+    tasks = [(cells[index][2], cells[index][0], cells[index][1], seeds, max_rounds) for index in pending]
+    if pool is not None:
+        played = pool.imap(_run_matchup_task, tasks)
+    else:
+        played = (run_matchup(*task, log=log) for task in tasks)
+    for index, counts in zip(pending, played):
+        store.put(keys[index], counts)
+        cell_counts[index] = counts
+        if progress is not None:
+            goody_cls, baddy_cls, maze = cells[index]
+            progress(maze, goody_cls, baddy_cls, counts, False)
+
+    matrix = OrderedDict()
+    for (goody_cls, baddy_cls, _maze), counts in zip(cells, cell_counts):
+        totals = matrix.setdefault((goody_cls, baddy_cls), dict.fromkeys(RESULTS + ("rounds",), 0))
+        for name in totals:
+            totals[name] += counts[name]
+    return matrix
+
+
+def format_matrix(matrix):
+    ''' Return a table of goodies' win rates, with a row per goody class and a column per baddy class '''
+    if not matrix:
+        return "No matchups to show"
+    goodies = list(OrderedDict.fromkeys(goody for goody, _ in matrix))
+    baddies = list(OrderedDict.fromkeys(baddy for _, baddy in matrix))
+    name_width = max(len(goody.__name__) for goody in goodies)
+    widths = [max(len(baddy.__name__), 6) for baddy in baddies]
+    lines = [" " * name_width + "".join("  " + baddy.__name__.rjust(width) for baddy, width in zip(baddies, widths))]
+    for goody in goodies:
+        cells = []
+        for baddy, width in zip(baddies, widths):
+            counts = matrix[goody, baddy]
+            games = sum(counts[result] for result in RESULTS)
+            cells.append("  " + "{:.1%}".format(counts[Game.goodies_win] / games if games else 0).rjust(width))
+        lines.append(goody.__name__.ljust(name_width) + "".join(cells))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # The command line lives in cli.py - this is the same as "python -m maze tournament ..."
+    from cli import main
+    sys.exit(main(["tournament"] + sys.argv[1:]))